@@ -4,32 +4,39 @@
 # FIXED VERSION: Monitors packet loss metrics instead of log errors
 # DATA STALENESS FIX: ConfigurationAgent now uses time-based filtering and MonitoringAgent's detected UE
 
+import asyncio
+import functools
 import os
 import random
+import sys
 import time
-import yaml
+from dataclasses import dataclass, field
 from typing import TypedDict, Optional
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_nvidia_ai_endpoints import ChatNVIDIA
 from langgraph.graph import StateGraph, MessagesState
 from langgraph.prebuilt import create_react_agent
-from tools import reconfigure_network, get_packetloss_logs
+from tools import reconfigure_network, get_packetloss_logs, load_config, kinetica_pool, TABLE_NAME_PATTERN
 import logging
+import orjson
 from dotenv import load_dotenv, find_dotenv
-import pandas as pd
-import gpudb
 
 # Load environment variables from .env file
 load_dotenv(find_dotenv())
 
 print("___________________________________________starting agents (FIXED VERSION - MessagesState)")
 
-# Setup Phoenix tracing if enabled
 PHOENIX_ENABLED = os.getenv('PHOENIX_ENABLED', 'true').lower() == 'true'
-if PHOENIX_ENABLED:
+
+@functools.cache
+def init_tracing():
+    """Set up Phoenix tracing if enabled. Called by the entry point; runs at most once per process."""
+    if not PHOENIX_ENABLED:
+        print("ℹ️  Phoenix tracing disabled (set PHOENIX_ENABLED=true to enable)\n")
+        return
+
     try:
         # Import Phoenix OTEL registration from nat_5g_slicing
-        import sys
         nat_wrapper_path = os.path.join(os.path.dirname(__file__), 'nat_wrapper', 'src')
         if nat_wrapper_path not in sys.path:
             sys.path.insert(0, nat_wrapper_path)
@@ -40,13 +47,13 @@ if PHOENIX_ENABLED:
         # Register Phoenix tracer provider (global)
         # Let Phoenix auto-configure the endpoint to avoid 405 errors
         tracer_provider = phoenix_register(
-            project_name="5g-network-monitoring-agent"
+            project_name="5g-network-monitoring-agent",
+            batch=True  # export spans in the background instead of on every span end
         )
 
         # Suppress verbose logging from OpenTelemetry before instrumentation
-        import logging as stdlib_logging
-        stdlib_logging.getLogger('openinference').setLevel(stdlib_logging.WARNING)
-        stdlib_logging.getLogger('opentelemetry').setLevel(stdlib_logging.WARNING)
+        logging.getLogger('openinference').setLevel(logging.WARNING)
+        logging.getLogger('opentelemetry').setLevel(logging.WARNING)
 
         # Instrument LangChain
         instrumentor = LangChainInstrumentor()
@@ -60,27 +67,31 @@ if PHOENIX_ENABLED:
     except Exception as e:
         print(f"⚠️  Phoenix tracing failed to initialize: {e}")
         print(f"   Continuing without Phoenix...\n")
-else:
-    print("ℹ️  Phoenix tracing disabled (set PHOENIX_ENABLED=true to enable)\n")
 
 # Configure the logger without timestamp and level tags
-config_file =  yaml.safe_load(open('config.yaml', 'r'))
-
 logging.basicConfig(
-    filename= config_file['AGENT_LOG_FILE'],  # Log file name
+    filename= load_config()['AGENT_LOG_FILE'],  # Log file name
     level=logging.INFO,   # Log level
     format="%(message)s",  # Only log the message
     force=True  # Override any existing logging config
 )
 
-# Get the root logger and disable buffering
+# Get the root logger
 logger = logging.getLogger()
 for handler in logger.handlers:
     handler.setLevel(logging.INFO)
-    handler.flush()
-    # Force immediate flush after each log by disabling buffering
-    if hasattr(handler, 'stream'):
-        handler.stream.reconfigure(line_buffering=True)
+
+# Machine-readable detection events, one JSON object per line next to the agent log.
+# agent.log stays human-readable because the UI streams it as-is.
+events_logger = logging.getLogger('agent_events')
+events_logger.setLevel(logging.INFO)
+events_logger.propagate = False
+if not events_logger.handlers:
+    events_handler = logging.FileHandler(
+        os.path.join(os.path.dirname(load_config()['AGENT_LOG_FILE']), 'agent_events.jsonl')
+    )
+    events_handler.setFormatter(logging.Formatter("%(message)s"))
+    events_logger.addHandler(events_handler)
 
 #llm api to use Nvidia NIM Inference Endpoints.
 llm = ChatNVIDIA(
@@ -91,19 +102,31 @@ llm = ChatNVIDIA(
         max_tokens=4096,
 )
 
-# Kinetica connection setup
-os.environ["KINETICA_HOST"] = os.getenv("KINETICA_HOST", "192.168.70.172:9191")
-os.environ["KINETICA_USERNAME"] = os.getenv("KINETICA_USERNAME", "admin")
-os.environ["KINETICA_PASSWORD"] = os.getenv("KINETICA_PASSWORD", "admin")
-
-kdbc_options = gpudb.GPUdb.Options()
-kdbc_options.username = os.environ.get("KINETICA_USERNAME")
-kdbc_options.password = os.environ.get("KINETICA_PASSWORD")
-kdbc_options.disable_auto_discovery = True
-kdbc: gpudb.GPUdb = gpudb.GPUdb(
-    host=os.environ.get("KINETICA_HOST"),
-    options=kdbc_options
-)
+# Per-UE packet loss over the last 30 seconds. Grouped in Kinetica so each poll
+# returns one row per UE instead of every raw iperf sample.
+LOSS_AGGREGATE_SQL = """
+            SELECT ue, AVG(loss_percentage) as avg_loss, MAX(loss_percentage) as max_loss, COUNT(*) as samples
+            FROM {table}
+            WHERE timestamp > NOW() - INTERVAL '30' SECOND
+            GROUP BY ue
+            """
+
+_inflight_queries = {}  # SQL string -> in-flight query shared by concurrent callers
+
+def _query_records(sql: str) -> list:
+    """Run a query on a pooled Kinetica connection and return the decoded records."""
+    with kinetica_pool.acquire() as kdbc:
+        response = kdbc.execute_sql_and_decode(sql)
+    return response["records"] if response and "records" in response else []
+
+async def _shared_query(sql: str) -> list:
+    """Run _query_records off the event loop, sharing one RPC between concurrent callers of the same SQL."""
+    query = _inflight_queries.get(sql)
+    if query is None:
+        query = asyncio.ensure_future(asyncio.to_thread(_query_records, sql))
+        _inflight_queries[sql] = query
+        query.add_done_callback(lambda _: _inflight_queries.pop(sql, None))
+    return await asyncio.shield(query)
 
 # State class for communication between agents
 # FIXED: Now extends MessagesState to properly handle message objects
@@ -116,15 +139,32 @@ class State(MessagesState):
     config_value: Optional[list] = None  # keep a track of slice values
     count: Optional[int] = None
 
-def MonitoringAgent(state: State):
+@dataclass(slots=True)
+class FastState:
+    """Attribute view of the State fields the agents read, built once per node run"""
+    start: int = 0
+    count: int = 0
+    files: Optional[dict] = None
+    consent: str = 'yes'
+    config_value: list = field(default_factory=lambda: ["50", "50"])
+
+    @classmethod
+    def from_messages_state(cls, state: State) -> "FastState":
+        # Missing or None fields fall back to the defaults above
+        return cls(**{name: state[name] for name in cls.__slots__ if state.get(name) is not None})
+
+async def MonitoringAgent(state: State):
     """
     FIXED VERSION: Monitors packet loss metrics from Kinetica database
     instead of log files for buffer errors
+
+    Runs as a coroutine so the wait between checks does not block the event loop.
     """
     response = "This is a Monitoring agent, monitoring PACKET LOSS METRICS for network issues."
+    fast_state = FastState.from_messages_state(state)
 
     # Only log the agent start message once
-    if state.get('count', 0) == 0:
+    if fast_state.count == 0:
         logging.info("\n" + "="*80)
         logging.info(response)
         logging.info("="*80 + "\n")
@@ -134,7 +174,7 @@ def MonitoringAgent(state: State):
     CHECK_INTERVAL = 10  # Check every 10 seconds
 
     # Only log configuration on first run
-    if state.get('count', 0) == 0:
+    if fast_state.count == 0:
         logging.info(f"📊 Monitoring Configuration:")
         logging.info(f"   - Packet Loss Threshold: {PACKET_LOSS_THRESHOLD}%")
         logging.info(f"   - Check Interval: {CHECK_INTERVAL} seconds")
@@ -148,146 +188,146 @@ def MonitoringAgent(state: State):
 
             if not iperf_table_name:
                 logging.info("⚠️  IPERF3_RANDOM_TABLE_NAME not set, waiting...")
-                time.sleep(CHECK_INTERVAL)
+                await asyncio.sleep(CHECK_INTERVAL)
                 continue
 
-            # Query recent packet loss data
-            sql_query = f"""
-            SELECT ue, AVG(loss_percentage) as avg_loss, MAX(loss_percentage) as max_loss, COUNT(*) as samples
-            FROM {iperf_table_name}
-            WHERE timestamp > NOW() - INTERVAL '30' SECOND
-            GROUP BY ue
-            """
+            # The table name is interpolated into SQL, so it must be a plain [schema.]table identifier
+            if not TABLE_NAME_PATTERN.fullmatch(iperf_table_name):
+                logging.info("⚠️  Invalid IPERF3_RANDOM_TABLE_NAME %r, waiting...", iperf_table_name)
+                await asyncio.sleep(CHECK_INTERVAL)
+                continue
+
+            # Query recent packet loss data, aggregated per UE
+            sql_query = LOSS_AGGREGATE_SQL.format(table=iperf_table_name)
 
             # Query without logging - reduces verbosity
-            result_df = kdbc.to_df(sql=sql_query)
+            # Only a handful of rows come back (one per UE), so work on the decoded records directly
+            records = await _shared_query(sql_query)
 
-            if result_df is None or result_df.empty:
-                logging.info(f"⏳ No recent data yet, waiting {CHECK_INTERVAL} seconds...\n")
-                time.sleep(CHECK_INTERVAL)
+            if not records:
+                logging.info("⏳ No recent data yet, waiting %d seconds...\n", CHECK_INTERVAL)
+                await asyncio.sleep(CHECK_INTERVAL)
                 continue
 
             # Check if any UE exceeds threshold
-            high_loss_ues = result_df[result_df['max_loss'] > PACKET_LOSS_THRESHOLD]
+            high_loss_ues = [r for r in records if r['max_loss'] > PACKET_LOSS_THRESHOLD]
+
+            if high_loss_ues:
+                # FIXED: Process worst UE first
+                worst_ue = max(high_loss_ues, key=lambda r: r['max_loss'])
 
-            if not high_loss_ues.empty:
                 # Only log when there's an issue
-                logging.info(f"\n📊 Current Network Metrics (Last 30 seconds):")
-                for _, row in result_df.iterrows():
-                    logging.info(f"   - {row['ue']}: Avg Loss={row['avg_loss']:.2f}%, Max Loss={row['max_loss']:.2f}%, Samples={row['samples']}")
+                logging.info("\n📊 Current Network Metrics (Last 30 seconds):")
+                for row in records:
+                    logging.info("   - %s: Avg Loss=%.2f%%, Max Loss=%.2f%%, Samples=%s", row['ue'], row['avg_loss'], row['max_loss'], row['samples'])
 
-                logging.info(f"\n🚨 HIGH PACKET LOSS DETECTED!")
-                for _, row in high_loss_ues.iterrows():
-                    logging.info(f"   - {row['ue']}: {row['max_loss']:.2f}% loss (threshold: {PACKET_LOSS_THRESHOLD}%)")
+                logging.info("\n🚨 HIGH PACKET LOSS DETECTED!")
+                for row in high_loss_ues:
+                    logging.info("   - %s: %.2f%% loss (threshold: %s%%)", row['ue'], row['max_loss'], PACKET_LOSS_THRESHOLD)
 
                 # IMPROVED: Warn if multiple UEs have high loss
                 if len(high_loss_ues) > 1:
-                    logging.info(f"\n⚠️  WARNING: Multiple UEs ({len(high_loss_ues)}) have high packet loss!")
-                    logging.info(f"   Processing UE with highest loss first: {high_loss_ues.iloc[0]['ue']}\n")
+                    logging.info("\n⚠️  WARNING: Multiple UEs (%d) have high packet loss!", len(high_loss_ues))
+                    logging.info("   Processing UE with highest loss first: %s\n", worst_ue['ue'])
 
-                logging.info(f"\n➡️  Triggering Configuration Agent for reconfiguration...\n")
+                logging.info("\n➡️  Triggering Configuration Agent for reconfiguration...\n")
 
-                # FIXED: Sort by max_loss to process worst UE first
-                high_loss_ues = high_loss_ues.sort_values('max_loss', ascending=False)
+                events_logger.info(orjson.dumps({
+                    "event": "high_loss",
+                    "time": time.time(),
+                    "threshold": PACKET_LOSS_THRESHOLD,
+                    "selected_ue": worst_ue['ue'],
+                    "ues": records
+                }).decode())
 
                 # Prepare data for Configuration Agent
                 trigger_data = {
-                    "ue": high_loss_ues.iloc[0]['ue'],
-                    "avg_loss": high_loss_ues.iloc[0]['avg_loss'],
-                    "max_loss": high_loss_ues.iloc[0]['max_loss'],
-                    "samples": high_loss_ues.iloc[0]['samples']
+                    "ue": worst_ue['ue'],
+                    "avg_loss": worst_ue['avg_loss'],
+                    "max_loss": worst_ue['max_loss'],
+                    "samples": worst_ue['samples']
                 }
 
                 # FIXED: Return messages as a list of message objects (SystemMessage)
                 return {
                     "messages": [SystemMessage(content=response)],
-                    "start": state.get('start', 0),
+                    "start": fast_state.start,
                     "files": {"metrics": trigger_data},
-                    "config_value": state.get('config_value', ["50", "50"]),
-                    "count": state.get('count', 0),
-                    "consent": state.get('consent', 'yes')
+                    "config_value": fast_state.config_value,
+                    "count": fast_state.count,
+                    "consent": fast_state.consent
                 }
             else:
                 # No logging when everything is normal - reduces log clutter
-                time.sleep(CHECK_INTERVAL)
+                await asyncio.sleep(CHECK_INTERVAL)
 
         except Exception as e:
-            logging.info(f"❌ Error in MonitoringAgent: {e}")
-            logging.info(f"   Retrying in {CHECK_INTERVAL} seconds...\n")
-            time.sleep(CHECK_INTERVAL)
+            logging.info("❌ Error in MonitoringAgent: %s", e)
+            logging.info("   Retrying in %d seconds...\n", CHECK_INTERVAL)
+            await asyncio.sleep(CHECK_INTERVAL)
 
 system_promt = 'You are a Configuration agent in a LangGraph. Your task is to help an user reconfigure a current 5G network. You must reply to the questions asked concisely, and exactly in the format directed to you.'
 config_agent = create_react_agent(llm, tools=[reconfigure_network, get_packetloss_logs], prompt = system_promt)
 
-def ConfigurationAgent(state: State):
+# Constant part of the reconfiguration request; the per-call input is appended at the end
+RECONFIGURE_PROMPT = '''
+
+    Your task is to reconfigure the network using the `reconfigure_network` tool. The tool accepts the following parameters:
+    1. `UE` = UE (UE1 or UE2) which requires reconfiguration
+    2. `value_1_old` = Old value 1 of configs
+    3. `value_2_old` = Old value 2 of configs
+
+    Use the tool to reconfigure the network. Return **only** the tool response list as the output.
+
+    Here is the input:'''
+
+async def ConfigurationAgent(state: State):
     # Use a separate variable name to avoid collision with agent invoke responses
     agent_description = "This is a Configuration Agent, whose goal is to reconfigure the network to solve packet loss issues."
     logging.info("\n" + "="*80)
     logging.info(agent_description)
     logging.info("="*80 + "\n")
-    logging.info("Packet loss metrics detected: \n %s \n\n", state['files']['metrics'])
+    fast_state = FastState.from_messages_state(state)
+    metrics = fast_state.files['metrics']
+    logging.info("Packet loss metrics detected: \n %s \n\n", metrics)
 
     # FIXED: Use the UE already detected by MonitoringAgent instead of re-analyzing
-    detected_ue = state['files']['metrics']['ue']
-    detected_max_loss = state['files']['metrics']['max_loss']
+    detected_ue = metrics['ue']
+    detected_max_loss = metrics['max_loss']
 
     logging.info(f"🔍 Step 1: Using UE detected by MonitoringAgent...")
     logging.info(f"   Detected UE: {detected_ue}")
     logging.info(f"   Max packet loss: {detected_max_loss:.2f}%\n")
 
-    # Still call get_packetloss_logs for verification and logging purposes
-    prompt_0 = f'''
-    The Monitoring Agent has detected high packet loss for {detected_ue} ({detected_max_loss:.2f}%).
-
-    Call the get_packetloss_logs tool to verify and get recent packet loss data.
-    Action: get_packetloss_logs()
-
-    After reviewing the logs, confirm that {detected_ue} is the UE that needs reconfiguration.
-    Reply with ONLY the UE name: either "UE1" or "UE2". DO NOT provide explanation.
-    '''
-
-    human_message = HumanMessage(content=prompt_0)
-    response = config_agent.invoke({"messages":[human_message]})
-    cleaned_content0 = response['messages'][-1].content
-    logging.info(f"🎯 AI Confirmation: {cleaned_content0} requires reconfiguration\n")
-
-    # Validation: Ensure AI confirms the same UE detected by MonitoringAgent
-    if cleaned_content0.strip() != detected_ue:
-        logging.info(f"⚠️  WARNING: AI selected {cleaned_content0} but MonitoringAgent detected {detected_ue}")
-        logging.info(f"   Using MonitoringAgent's detection: {detected_ue} (more reliable)\n")
-        cleaned_content0 = detected_ue
-
-    prompt_1 = f'''
-
-    Your task is to reconfigure the network using the `reconfigure_network` tool. The tool accepts the following parameters:
-    1. `UE` = UE (UE1 or UE2) which requires reconfiguration
-    2. `value_1_old` = Old value 1 of configs
-    3. `value_2_old` = Old value 2 of configs
-
-    Here is the input:
-    - `UE` = {cleaned_content0}
-    - `value_1_old` = {state['config_value'][0]}
-    - `value_2_old` = {state['config_value'][1]}
-
-    Use the tool to reconfigure the network. Return **only** the tool response list as the output.'''
+    # Static instructions first, variables last, so NIM can reuse the cached prompt prefix
+    prompt_1 = RECONFIGURE_PROMPT + f'''
+    - `UE` = {detected_ue}
+    - `value_1_old` = {fast_state.config_value[0]}
+    - `value_2_old` = {fast_state.config_value[1]}'''
 
     logging.info("🔧 Step 2: Reconfiguring network slice parameters...")
     human_message2 = HumanMessage(content=prompt_1)
-    response2 = config_agent.invoke({"messages":[human_message2]})
+    # The detected UE is used as-is, so there is no need to ask the LLM to confirm it.
+    # Still fetch the packet loss logs for the audit trail, calling the tool directly,
+    # before the reconfiguration starts so the snapshot shows the loss that triggered it.
+    packetloss_summary = await get_packetloss_logs.ainvoke({})
+    logging.info(f"📋 Packet loss logs at reconfiguration time:\n{packetloss_summary}\n")
+    response2 = await config_agent.ainvoke({"messages":[human_message2]})
+
     config_value_updated = response2['messages'][-2].content
     config_value_updated = config_value_updated.strip("[]").replace("'", "").split(", ")
     logging.info(f"✅ Reconfiguration complete! New slice values: {config_value_updated}\n")
-    count = state['count']
-    count += 1
+    count = fast_state.count + 1
     logging.info(f"📊 Total reconfigurations performed: {count}\n")
 
     #start monitoring from the end
-    start = state.get('start', 0)
+    start = fast_state.start
 
     #take in human input
     consent = 'yes'
-    if count >= config_file['interrupt_after']:
-        consent = input("Do you want to continue Monitoring? (yes/no)")
+    if count >= load_config()['interrupt_after']:
+        # input() blocks, so wait for it in a worker thread and keep the event loop free
+        consent = await asyncio.to_thread(input, "Do you want to continue Monitoring? (yes/no)")
 
     # FIXED: Return messages as a list of message objects (SystemMessage)
     # Use agent_description (not response, which is now a dict from config_agent.invoke)
@@ -100,11 +100,8 @@ class InfluxDBMetricsClient:
             
         try:
             points = []
-            for _, row in df.iterrows():
-                ue = row[ue_column]
-                loss = row[loss_column]
-                bitrate = row[bitrate_column]
-                timestamp = row[timestamp_column]
+            columns = df[[ue_column, loss_column, bitrate_column, timestamp_column]]
+            for ue, loss, bitrate, timestamp in columns.itertuples(index=False, name=None):
                 
                 # Create data points
                 loss_point = Point("network_metrics") \
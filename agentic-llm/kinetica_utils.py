@@ -0,0 +1,86 @@
+"""
+Kinetica connection pool for the 5G network agents
+"""
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+import gpudb
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing rule of thumb: two connections per core plus one
+DEFAULT_POOL_SIZE = (os.cpu_count() or 4) * 2 + 1
+
+class KineticaPool:
+    def __init__(self, host, username, password, size=DEFAULT_POOL_SIZE,
+                 connection_timeout=10, max_lifetime=30 * 60, request_timeout=None):
+        """
+        Initialize a bounded pool of Kinetica connections
+
+        Args:
+            host (str): Kinetica host and port
+            username (str): Kinetica username
+            password (str): Kinetica password
+            size (int): Maximum number of connections handed out at once
+            connection_timeout (float): Seconds to wait for a free connection
+            max_lifetime (float): Seconds after which an idle connection is replaced
+            request_timeout (float): Per-request timeout in seconds, None keeps the gpudb default
+        """
+        self.host = host
+        self.username = username
+        self.password = password
+        self.size = size
+        self.connection_timeout = connection_timeout
+        self.max_lifetime = max_lifetime
+        self.request_timeout = request_timeout
+        self.active = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Open a new connection, returned together with its creation time"""
+        options = gpudb.GPUdb.Options()
+        options.username = self.username
+        options.password = self.password
+        options.disable_auto_discovery = True
+        if self.request_timeout is not None:
+            options.timeout = int(self.request_timeout * 1000)  # milliseconds
+        return time.monotonic(), gpudb.GPUdb(host=self.host, options=options)
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a connection for the duration of a `with` block"""
+        if not self._slots.acquire(timeout=self.connection_timeout):
+            raise TimeoutError(f"No Kinetica connection available after {self.connection_timeout}s")
+        try:
+            try:
+                created, kdbc = self._idle.get_nowait()
+                if time.monotonic() - created > self.max_lifetime:
+                    logger.debug("Recycling Kinetica connection past its max lifetime")
+                    created, kdbc = self._connect()
+            except queue.Empty:
+                created, kdbc = self._connect()
+
+            with self._lock:
+                self.active += 1
+            try:
+                yield kdbc
+            finally:
+                with self._lock:
+                    self.active -= 1
+                self._idle.put((created, kdbc))
+        finally:
+            self._slots.release()
+
+    @property
+    def idle(self):
+        """Number of open connections waiting to be reused"""
+        return self._idle.qsize()
+
+    def metrics(self):
+        """Pool usage counters, suitable for exporting to a metrics endpoint"""
+        return {"size": self.size, "active": self.active, "idle": self.idle}
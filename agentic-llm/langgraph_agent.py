@@ -13,22 +13,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #script to define langgraph agent, and start the workflow
+import asyncio
 import json
 import os
 import time
-import yaml
 from typing import Literal
 from langchain_core.messages import convert_to_messages, BaseMessage, AIMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, MessagesState, END
 from langgraph.prebuilt import ToolNode
-from IPython.display import Image, display
-from agents import ConfigurationAgent, MonitoringAgent, State
+from agents import ConfigurationAgent, MonitoringAgent, State, init_tracing
+from tools import load_config
 from langchain_nvidia_ai_endpoints import ChatNVIDIA
 import logging
 import json
 
-config_file =  yaml.safe_load(open('config.yaml', 'r'))
+# Parsed once per process and shared with agents/tools
+config_file = load_config()
 file_path = config_file['gnb_logs']
 os.makedirs(os.path.dirname(config_file['AGENT_LOG_FILE']), exist_ok=True)
 
@@ -109,10 +110,10 @@ def compile_workflow(graph, img_name="./images/langgraph_DLI.png"):
         print("Saved graph image as ", img_name)
     return workflow
 
-from langchain_core.runnables.graph import MermaidDrawMethod
-from IPython.display import Image, display
-
 def display_graph(workflow):
+    # Notebook-only helper; import the display stack here so running the agent does not load IPython
+    from langchain_core.runnables.graph import MermaidDrawMethod
+    from IPython.display import Image, display
     try:
         print(workflow.get_graph())
         display(Image(workflow.get_graph().draw_mermaid_png(draw_method=MermaidDrawMethod.PYPPETEER)))
@@ -120,7 +121,8 @@ def display_graph(workflow):
     except Exception as e:
         print("ERROR IN GRAPH")
         print(e)
-def main():
+async def main():
+    init_tracing()
     graph = create_graph()
     workflow = compile_workflow(graph)
 
@@ -138,9 +140,10 @@ def main():
         "count": 0
     }
     count = 0
-    for s in workflow.stream(input, config, subgraphs=True):
+    # MonitoringAgent is a coroutine, so the graph has to be driven asynchronously
+    async for s in workflow.astream(input, config, subgraphs=True):
         formatted = pretty_print_message(s)
         logging.info(formatted)
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
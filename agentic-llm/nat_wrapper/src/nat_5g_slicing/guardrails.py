@@ -4,11 +4,69 @@
 """Guardrails and output validation for NAT workflows to prevent hallucinations."""
 
 import re
+import hashlib
 import logging
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional, Callable
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 from enum import Enum
 
+# Aho-Corasick keyword scanning is optional - fall back to substring checks without it
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+# Tool names that only show up in hallucinated tool calls
+_INVALID_TOOLS = ("invalid_tool", "unknown_tool", "fake_function")
+
+# Contradictory statement pairs, compiled once at import. The leading literal must appear
+# in the response for the first pattern to match, so the regexes only run on a keyword hit.
+_CONTRADICTION_PATTERNS = [
+    ("detected", re.compile(r"packet.*loss.*detected"), re.compile(r"no.*issue|no.*problem|all.*good")),
+    ("occurred", re.compile(r"error.*occurred"), re.compile(r"successfully.*completed")),
+    ("failed", re.compile(r"failed"), re.compile(r"success")),
+]
+
+# UE identifiers accepted by reconfigure_network
+_VALID_UES = frozenset(("UE1", "UE2"))
+
+# Number of LLM response verdicts kept per validator
+_VERDICT_CACHE_SIZE = 4096
+
+# Keywords expected in a relevant response for each tool
+_TOOL_KEYWORDS = {
+    "reconfigure_network": frozenset(("bandwidth", "allocation", "configuration", "reconfigure", "slice")),
+    "get_packetloss_logs": frozenset(("packet", "loss", "data", "logs", "metrics")),
+}
+
+
+class _KeywordScanner:
+    """Find which of a fixed set of keywords occur in a text in a single pass."""
+
+    def __init__(self, keywords):
+        self.keywords = keywords
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+
+    def hits(self, text: str) -> set:
+        """Return the keywords found in text."""
+        if self._automaton is None:
+            return {kw for kw in self.keywords if kw in text}
+        return {kw for _, kw in self._automaton.iter(text)}
+
+    def any_hit(self, text: str) -> bool:
+        """Return True as soon as any keyword is found in text."""
+        if self._automaton is None:
+            return any(kw in text for kw in self.keywords)
+        return next(self._automaton.iter(text), None) is not None
+
 
 class ValidationMode(str, Enum):
     """Validation modes for guardrails."""
@@ -28,6 +86,18 @@ class GuardrailRule(BaseModel):
     min_value: Optional[float] = None
     max_value: Optional[float] = None
 
+    _compiled: Optional[re.Pattern] = PrivateAttr(default=None)
+    _allowed: Optional[frozenset] = PrivateAttr(default=None)
+
+    @model_validator(mode="after")
+    def _compile_pattern(self) -> "GuardrailRule":
+        """Compile the pattern and enum set once so validation does not rebuild them per call."""
+        if self.rule_type == "pattern" and self.pattern is not None:
+            self._compiled = re.compile(self.pattern)
+        elif self.rule_type == "enum" and self.allowed_values is not None:
+            self._allowed = frozenset(self.allowed_values)
+        return self
+
 
 class OutputValidator:
     """Validate agent outputs and enforce guardrails to prevent hallucinations."""
@@ -40,6 +110,14 @@ class OutputValidator:
         self.mode = mode
         self.rules = rules or []
         self.logger = logging.getLogger(__name__)
+        self._response_scanner = _KeywordScanner(
+            _INVALID_TOOLS + tuple(anchor for anchor, _, _ in _CONTRADICTION_PATTERNS)
+        )
+        self._semantic_scanners = {
+            tool: _KeywordScanner(keywords) for tool, keywords in _TOOL_KEYWORDS.items()
+        }
+        # (tool_name, response digest) -> validation verdict, least recently used first
+        self._verdict_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
 
     def add_rule(self, rule: GuardrailRule) -> None:
         """Add a guardrail rule to the validator."""
@@ -91,15 +169,14 @@ class OutputValidator:
 
         if rule.rule_type == "pattern":
             if isinstance(output, str):
-                pattern = re.compile(rule.pattern)
-                return bool(pattern.match(output))
+                return bool(rule._compiled.match(output))
             return False
 
         elif rule.rule_type == "enum":
             if rule.field:
                 field_value = output.get(rule.field) if isinstance(output, dict) else getattr(output, rule.field, None)
-                return field_value in rule.allowed_values
-            return output in rule.allowed_values
+                return field_value in rule._allowed
+            return output in rule._allowed
 
         elif rule.rule_type == "range":
             if rule.field:
@@ -127,6 +204,28 @@ class OutputValidator:
             Dictionary with validation results including is_valid, issues, and confidence
         """
 
+        # Identical responses get identical verdicts, so reuse them
+        cache_key = (tool_name, hashlib.blake2b(response.encode(), digest_size=16).digest())
+        cached = self._verdict_cache.get(cache_key)
+        if cached is not None:
+            self._verdict_cache.move_to_end(cache_key)
+            validations = {**cached, "issues": list(cached["issues"])}
+        else:
+            validations = self._check_llm_response(response, tool_name)
+            self._verdict_cache[cache_key] = {**validations, "issues": list(validations["issues"])}
+            if len(self._verdict_cache) > _VERDICT_CACHE_SIZE:
+                self._verdict_cache.popitem(last=False)
+
+        if not validations["is_valid"]:
+            self.logger.warning(
+                f"LLM response validation failed for {tool_name}: {validations['issues']}"
+            )
+
+        return validations
+
+    def _check_llm_response(self, response: str, tool_name: str) -> Dict[str, Any]:
+        """Run the hallucination, contradiction and semantic checks on a response."""
+
         validations = {
             "is_valid": True,
             "tool_name": tool_name,
@@ -134,69 +233,56 @@ class OutputValidator:
             "confidence": 1.0
         }
 
+        # Lowercase once; one keyword sweep then feeds both the hallucination and contradiction checks
+        response_lower = response.lower()
+        keyword_hits = self._response_scanner.hits(response_lower)
+
         # Check for hallucinated tool calls
-        if self._contains_hallucinated_calls(response):
+        if self._contains_hallucinated_calls(response_lower, keyword_hits):
             validations["issues"].append("Detected potentially hallucinated tool calls")
             validations["is_valid"] = False
             validations["confidence"] = 0.5
 
         # Check for contradictory statements
-        if self._contains_contradictions(response):
+        if self._contains_contradictions(response_lower, keyword_hits):
             validations["issues"].append("Response contains contradictory statements")
             validations["is_valid"] = False
             validations["confidence"] = 0.7
 
         # Semantic validation
-        if not self._validate_semantics(response, tool_name):
+        if not self._validate_semantics(response_lower, tool_name):
             validations["issues"].append("Response fails semantic validation")
             validations["is_valid"] = False
             validations["confidence"] = 0.6
 
-        if not validations["is_valid"]:
-            self.logger.warning(
-                f"LLM response validation failed for {tool_name}: {validations['issues']}"
-            )
-
         return validations
 
-    def _contains_hallucinated_calls(self, response: str) -> bool:
-        """Detect hallucinated tool calls that don't exist."""
-        # Look for invalid tool names
-        invalid_tools = ["invalid_tool", "unknown_tool", "fake_function"]
-        response_lower = response.lower()
-
-        return any(invalid in response_lower for invalid in invalid_tools)
+    def _contains_hallucinated_calls(self, response_lower: str, keyword_hits: Optional[set] = None) -> bool:
+        """Detect hallucinated tool calls that don't exist in the lowercased response."""
+        if keyword_hits is None:
+            keyword_hits = self._response_scanner.hits(response_lower)
 
-    def _contains_contradictions(self, response: str) -> bool:
-        """Detect contradictory statements in response."""
-        contradictions = [
-            (r"packet.*loss.*detected", r"no.*issue|no.*problem|all.*good"),
-            (r"error.*occurred", r"successfully.*completed"),
-            (r"failed", r"success"),
-        ]
+        return any(invalid in keyword_hits for invalid in _INVALID_TOOLS)
 
-        response_lower = response.lower()
+    def _contains_contradictions(self, response_lower: str, keyword_hits: Optional[set] = None) -> bool:
+        """Detect contradictory statements in the lowercased response."""
+        if keyword_hits is None:
+            keyword_hits = self._response_scanner.hits(response_lower)
 
-        for pattern1, pattern2 in contradictions:
-            if re.search(pattern1, response_lower) and re.search(pattern2, response_lower):
+        for anchor, pattern1, pattern2 in _CONTRADICTION_PATTERNS:
+            if anchor in keyword_hits and pattern1.search(response_lower) and pattern2.search(response_lower):
                 return True
 
         return False
 
-    def _validate_semantics(self, response: str, tool_name: str) -> bool:
-        """Validate semantic appropriateness of response for the tool."""
-
-        if tool_name == "reconfigure_network":
-            required_keywords = ["bandwidth", "allocation", "configuration", "reconfigure", "slice"]
-            has_keywords = any(kw in response.lower() for kw in required_keywords)
-            return has_keywords
+    def _validate_semantics(self, response_lower: str, tool_name: str) -> bool:
+        """Validate semantic appropriateness of the lowercased response for the tool."""
 
-        elif tool_name == "get_packetloss_logs":
-            required_keywords = ["packet", "loss", "data", "logs", "metrics"]
-            has_keywords = any(kw in response.lower() for kw in required_keywords)
-            return has_keywords
+        scanner = self._semantic_scanners.get(tool_name)
+        if scanner is None:
+            return True
 
-        return True
+        return scanner.any_hit(response_lower)
 
 
 class InputValidator:
@@ -223,29 +309,32 @@ class InputValidator:
             Tuple of (is_valid, list of issues)
         """
 
-        issues = []
+        # One bit per failed check: UE identifier, value_1_old range,
+        # value_2_old range, and the values summing to 100 (total bandwidth)
+        failed = (
+            (ue.upper() not in _VALID_UES)
+            | (not 0 <= value_1_old <= 100) << 1
+            | (not 0 <= value_2_old <= 100) << 2
+            | (value_1_old + value_2_old != 100) << 3
+        )
 
-        # Validate UE identifier
-        if ue.upper() not in ["UE1", "UE2"]:
-            issues.append(f"Invalid UE: {ue}. Must be 'UE1' or 'UE2'")
+        if not failed:
+            return True, []
 
-        # Validate bandwidth values are in range
-        if not (0 <= value_1_old <= 100):
+        # Only build the messages on the (rare) failure path
+        issues = []
+        if failed & 1:
+            issues.append(f"Invalid UE: {ue}. Must be 'UE1' or 'UE2'")
+        if failed & 2:
             issues.append(f"value_1_old {value_1_old} out of range [0-100]")
-
-        if not (0 <= value_2_old <= 100):
+        if failed & 4:
             issues.append(f"value_2_old {value_2_old} out of range [0-100]")
-
-        # Ensure values sum to 100 (total bandwidth)
-        if value_1_old + value_2_old != 100:
+        if failed & 8:
             issues.append(f"Bandwidth values must sum to 100, got {value_1_old + value_2_old}")
 
-        is_valid = len(issues) == 0
-
-        if not is_valid:
-            self.logger.warning(f"Input validation failed: {'; '.join(issues)}")
+        self.logger.warning(f"Input validation failed: {'; '.join(issues)}")
 
-        return is_valid, issues
+        return False, issues
 
     def validate_packetloss_input(self, limit: int) -> tuple[bool, List[str]]:
         """
@@ -3,13 +3,27 @@ from openinference.instrumentation.langchain import LangChainInstrumentor
 from opentelemetry import trace as trace_api
 from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk import trace as trace_sdk
-from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+# Phoenix app session shared by every caller in this process
+_SESSION = None
+
+def launch_phoenix_app():
+    """Launch the Phoenix app once per process and return its session."""
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = px.launch_app()
+    return _SESSION
 
 def setup_phoenix_tracing(endpoint: str = "http://0.0.0.0:6006"):
     """Setup Phoenix tracing for LangChain/NAT workflows."""
 
+    # LangChain is already traced (e.g. by register.py) - instrumenting again would duplicate every span
+    if LangChainInstrumentor().is_instrumented_by_opentelemetry:
+        return
+
     # Launch Phoenix in the background
-    session = px.launch_app()
+    session = launch_phoenix_app()
 
     # Setup tracer using Phoenix's built-in method (avoids 405 errors)
     tracer_provider = trace_sdk.TracerProvider()
@@ -18,7 +32,13 @@ def setup_phoenix_tracing(endpoint: str = "http://0.0.0.0:6006"):
     # Use Phoenix's collector endpoint (not OTLP endpoint to avoid 405)
     # Phoenix expects data on its own collector, not standard OTLP v1/traces
     otlp_exporter = OTLPSpanExporter(endpoint=f"{endpoint}")
-    tracer_provider.add_span_processor(SimpleSpanProcessor(otlp_exporter))
+    # Export spans in the background so span end does not wait on an HTTP request
+    tracer_provider.add_span_processor(BatchSpanProcessor(
+        otlp_exporter,
+        max_queue_size=2048,
+        max_export_batch_size=512,
+        schedule_delay_millis=2000
+    ))
 
     # Instrument LangChain with skip_dep_check to avoid message type errors
     LangChainInstrumentor().instrument(
@@ -6,25 +6,73 @@
 import time
 import logging
 import psutil
+import numpy as np
 import os
+import io
+import sys
 import json
+import random
 import asyncio
+import threading
+from array import array
 from functools import wraps
-from typing import Callable, Any, Dict, List
+from typing import Callable, Any, Dict
 from datetime import datetime
-from pydantic import BaseModel, Field
 from pathlib import Path
 from typing import Optional
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
-class PerformanceMetrics(BaseModel):
-    """Store performance metrics for a function execution."""
-    function_name: str
-    execution_time_ms: float
-    memory_used_mb: float
-    memory_peak_mb: float
-    timestamp: str
-    status: str  # success, error, timeout
+try:
+    _PAGESIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGESIZE = None  # No sysconf (e.g. Windows); RSS comes from psutil instead
+
+
+# Status strings are stored as one byte per sample
+_STATUSES = ("success", "error", "timeout")
+_STATUS_CODES = {status: code for code, status in enumerate(_STATUSES)}
+
+
+# Stored as memory_used_mb when the decorator was set up with track_memory=False
+_NOT_SAMPLED = float("nan")
+
+
+def _new_series() -> Dict[str, Any]:
+    """Empty per-function sample columns."""
+    return {
+        "t": array("d"),       # execution_time_ms
+        "m": array("d"),       # memory_used_mb, NaN when not sampled
+        "peak": array("d"),    # memory_peak_mb
+        "ts": array("q"),      # timestamp_ns
+        "status": bytearray()  # index into _STATUSES
+    }
+
+
+def _new_totals() -> Dict[str, float]:
+    """Empty running aggregates for one function."""
+    return {
+        "n": 0,
+        "sum_t": 0.0,
+        "sum_t2": 0.0,
+        "max_t": float("-inf"),
+        "min_t": float("inf"),
+        "n_m": 0,
+        "sum_m": 0.0,
+        "max_m": float("-inf"),
+        "successful": 0,
+        "slow": 0
+    }
+
+
+def _read_rss_mb() -> float:
+    """Read resident set size in MB straight from /proc/self/statm."""
+    with open("/proc/self/statm", "rb") as f:
+        return int(f.read().split()[1]) * _PAGESIZE / 1048576
 
 
 class PerformanceProfiler:
@@ -34,7 +82,9 @@ class PerformanceProfiler:
         self,
         output_dir: str = "./profiles",
         slow_warning_threshold_ms: float = 5000,
-        enabled: bool = True
+        enabled: bool = True,
+        memory_sample_interval_s: float = 0.05,
+        flush_every: int = 256
     ):
         """
         Initialize the performance profiler.
@@ -43,21 +93,77 @@ class PerformanceProfiler:
             output_dir: Directory to store profiling reports
             slow_warning_threshold_ms: Threshold for slow execution warnings
             enabled: Whether profiling is enabled
+            memory_sample_interval_s: How often the background thread samples process memory
+            flush_every: Number of buffered samples that triggers a flush to metrics.jsonl
         """
         self.output_dir = Path(output_dir)
         self.slow_warning_threshold_ms = slow_warning_threshold_ms
         self.enabled = enabled
-        self.metrics: Dict[str, List[Dict]] = {}
+        self.memory_sample_interval_s = memory_sample_interval_s
+        self.flush_every = flush_every
         self.logger = logging.getLogger(__name__)
 
+        # Samples not yet written to disk, and running aggregates of everything flushed
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._pending = 0
+        self._jsonl = None
+
+        # One process handle reused for every memory sample; only needed
+        # where /proc is missing (macOS, Windows)
+        self._proc = psutil.Process(os.getpid())
+        self._statm_available = _PAGESIZE is not None and os.path.exists("/proc/self/statm")
+
+        # Latest and peak RSS in MB, kept current by the sampling thread
+        self._rss_mb = 0.0
+        self._peak_rss_mb = 0.0
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_sampler = threading.Event()
+
         if self.enabled:
             self.output_dir.mkdir(parents=True, exist_ok=True)
+            self._jsonl = (self.output_dir / "metrics.jsonl").open("ab", buffering=65536)
+            self._start_memory_sampler()
             self.logger.info(f"Performance profiler initialized: {output_dir}")
 
+    def _sample_memory(self) -> None:
+        """Refresh the current and peak RSS readings."""
+        if self._statm_available:
+            rss_mb = _read_rss_mb()
+        else:
+            rss_mb = self._proc.memory_info().rss / 1024 / 1024  # MB
+        self._rss_mb = rss_mb
+        if rss_mb > self._peak_rss_mb:
+            self._peak_rss_mb = rss_mb
+
+    def _start_memory_sampler(self) -> None:
+        """Sample RSS in a daemon thread so profiled calls only read the latest value."""
+        def run() -> None:
+            while not self._stop_sampler.wait(self.memory_sample_interval_s):
+                self._sample_memory()
+
+        self._sample_memory()
+        self._sampler = threading.Thread(target=run, name="profiler-memory-sampler", daemon=True)
+        self._sampler.start()
+
+    def close(self) -> None:
+        """Stop the memory sampling thread and flush and close metrics.jsonl. Safe to call more than once."""
+        self._stop_sampler.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        if self._jsonl is not None:
+            try:
+                self._flush_metrics()
+            finally:
+                self._jsonl.close()
+                self._jsonl = None
+
     def profile_function(
         self,
         track_memory: bool = True,
-        slow_warning_ms: Optional[float] = None
+        slow_warning_ms: Optional[float] = None,
+        sample_rate: float = 1.0
     ) -> Callable:
         """
         Decorator to profile a function's performance.
@@ -65,6 +171,8 @@ class PerformanceProfiler:
         Args:
             track_memory: Whether to track memory usage
             slow_warning_ms: Custom threshold for slow execution warnings
+            sample_rate: Fraction of calls that are profiled; the rest call the
+                function directly. Sampled calls record time, and memory if track_memory
 
         Returns:
             Decorated function with profiling
@@ -73,17 +181,23 @@ class PerformanceProfiler:
         if slow_warning_ms is None:
             slow_warning_ms = self.slow_warning_threshold_ms
 
+        def sampled() -> bool:
+            """Decide once per call whether it is profiled"""
+            return sample_rate >= 1.0 or random.random() < sample_rate
+
         def decorator(func: Callable) -> Callable:
+            # Leave the function untouched when profiling is off
+            if not self.enabled:
+                return func
+
             @wraps(func)
             async def async_wrapper(*args, **kwargs) -> Any:
-                if not self.enabled:
+                if not sampled():
                     return await func(*args, **kwargs)
 
-                process = psutil.Process(os.getpid())
-
                 # Initial memory snapshot
-                mem_before = process.memory_info().rss / 1024 / 1024  # MB
-                start_time = time.time()
+                mem_before = self._rss_mb
+                start_ns = time.perf_counter_ns()
                 status = "success"
                 result = None
 
@@ -95,11 +209,13 @@ class PerformanceProfiler:
                     raise
                 finally:
                     # Final measurements
-                    end_time = time.time()
-                    mem_after = process.memory_info().rss / 1024 / 1024  # MB
-
-                    execution_time_ms = (end_time - start_time) * 1000
-                    memory_used_mb = mem_after - mem_before
+                    execution_time_ms = (time.perf_counter_ns() - start_ns) / 1e6
+                    if track_memory:
+                        memory_used_mb = self._rss_mb - mem_before
+                        memory_label = f"{memory_used_mb:.2f}MB"
+                    else:
+                        memory_used_mb = _NOT_SAMPLED
+                        memory_label = "n/a"
 
                     # Log if execution exceeds threshold
                     if execution_time_ms > slow_warning_ms:
@@ -109,32 +225,24 @@ class PerformanceProfiler:
                         )
 
                     # Record metrics
-                    metrics = PerformanceMetrics(
-                        function_name=func.__name__,
-                        execution_time_ms=execution_time_ms,
-                        memory_used_mb=memory_used_mb,
-                        memory_peak_mb=mem_after,
-                        timestamp=datetime.now().isoformat(),
-                        status=status
+                    self._record_metrics(
+                        func.__name__, execution_time_ms, memory_used_mb, self._peak_rss_mb, status
                     )
 
-                    self._record_metrics(metrics)
-
                     self.logger.info(
                         f"[PROFILE] {func.__name__} | Time: {execution_time_ms:.2f}ms | "
-                        f"Memory: {memory_used_mb:.2f}MB | Status: {status}"
+                        f"Memory: {memory_label} | Status: {status}"
                     )
 
                 return result
 
             @wraps(func)
             def sync_wrapper(*args, **kwargs) -> Any:
-                if not self.enabled:
+                if not sampled():
                     return func(*args, **kwargs)
 
-                process = psutil.Process(os.getpid())
-                mem_before = process.memory_info().rss / 1024 / 1024
-                start_time = time.time()
+                mem_before = self._rss_mb
+                start_ns = time.perf_counter_ns()
                 status = "success"
                 result = None
 
@@ -145,11 +253,13 @@ class PerformanceProfiler:
                     status = "error"
                     raise
                 finally:
-                    end_time = time.time()
-                    mem_after = process.memory_info().rss / 1024 / 1024
-
-                    execution_time_ms = (end_time - start_time) * 1000
-                    memory_used_mb = mem_after - mem_before
+                    execution_time_ms = (time.perf_counter_ns() - start_ns) / 1e6
+                    if track_memory:
+                        memory_used_mb = self._rss_mb - mem_before
+                        memory_label = f"{memory_used_mb:.2f}MB"
+                    else:
+                        memory_used_mb = _NOT_SAMPLED
+                        memory_label = "n/a"
 
                     if execution_time_ms > slow_warning_ms:
                         self.logger.warning(
@@ -157,19 +267,12 @@ class PerformanceProfiler:
                             f"{execution_time_ms:.2f}ms"
                         )
 
-                    metrics = PerformanceMetrics(
-                        function_name=func.__name__,
-                        execution_time_ms=execution_time_ms,
-                        memory_used_mb=memory_used_mb,
-                        memory_peak_mb=mem_after,
-                        timestamp=datetime.now().isoformat(),
-                        status=status
+                    self._record_metrics(
+                        func.__name__, execution_time_ms, memory_used_mb, self._peak_rss_mb, status
                     )
-
-                    self._record_metrics(metrics)
                     self.logger.info(
                         f"[PROFILE] {func.__name__} | Time: {execution_time_ms:.2f}ms | "
-                        f"Memory: {memory_used_mb:.2f}MB | Status: {status}"
+                        f"Memory: {memory_label} | Status: {status}"
                     )
 
                 return result
@@ -182,40 +285,115 @@ class PerformanceProfiler:
 
         return decorator
 
-    def _record_metrics(self, metrics: PerformanceMetrics) -> None:
-        """Record performance metrics in memory."""
-        if metrics.function_name not in self.metrics:
-            self.metrics[metrics.function_name] = []
+    def _record_metrics(
+        self,
+        function_name: str,
+        execution_time_ms: float,
+        memory_used_mb: float,
+        memory_peak_mb: float,
+        status: str
+    ) -> None:
+        """
+        Buffer performance metrics in memory until the next flush.
+
+        Each function keeps one typed array per field; every flush_every
+        samples the buffer is written out and folded into the aggregates.
+        """
+        series = self.metrics.get(function_name)
+        if series is None:
+            series = self.metrics[function_name] = _new_series()
+
+        series["t"].append(execution_time_ms)
+        series["m"].append(memory_used_mb)
+        series["peak"].append(memory_peak_mb)
+        series["ts"].append(time.time_ns())
+        series["status"].append(_STATUS_CODES[status])
+
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self._flush_metrics()
+
+    def _flush_metrics(self) -> None:
+        """Append buffered samples to metrics.jsonl and fold them into the running aggregates."""
+        if not self._pending or self._jsonl is None:
+            return
+
+        lines = []
+        for func_name, series in self.metrics.items():
+            if not series["t"]:
+                continue
 
-        self.metrics[metrics.function_name].append(metrics.dict())
+            # Zero-copy views over the sample arrays
+            times = np.frombuffer(series["t"], dtype=np.float64)
+            memories = np.frombuffer(series["m"], dtype=np.float64)
+            statuses = np.frombuffer(series["status"], dtype=np.uint8)
+
+            totals = self._totals.get(func_name)
+            if totals is None:
+                totals = self._totals[func_name] = _new_totals()
+            totals["n"] += times.size
+            totals["sum_t"] += float(times.sum())
+            totals["sum_t2"] += float(np.dot(times, times))
+            totals["max_t"] = max(totals["max_t"], float(times.max()))
+            totals["min_t"] = min(totals["min_t"], float(times.min()))
+            sampled = memories[~np.isnan(memories)]
+            if sampled.size:
+                totals["n_m"] += sampled.size
+                totals["sum_m"] += float(sampled.sum())
+                totals["max_m"] = max(totals["max_m"], float(sampled.max()))
+            totals["successful"] += int((statuses == _STATUS_CODES["success"]).sum())
+            totals["slow"] += int((times > self.slow_warning_threshold_ms).sum())
+
+            # One line per sample
+            for execution_time_ms, memory_used_mb, memory_peak_mb, timestamp_ns, status in zip(
+                series["t"], series["m"], series["peak"], series["ts"], series["status"]
+            ):
+                record = {
+                    "function_name": func_name,
+                    "execution_time_ms": execution_time_ms,
+                    "memory_used_mb": None if memory_used_mb != memory_used_mb else memory_used_mb,
+                    "memory_peak_mb": memory_peak_mb,
+                    "timestamp_ns": timestamp_ns,
+                    "status": _STATUSES[status]
+                }
+                if ORJSON_AVAILABLE:
+                    lines.append(orjson.dumps(record))
+                else:
+                    lines.append(json.dumps(record).encode())
+
+            self.metrics[func_name] = _new_series()
+
+        self._jsonl.write(b"\n".join(lines) + b"\n")
+        self._jsonl.flush()
+        self._pending = 0
 
     def generate_report(self) -> Dict[str, Any]:
         """
         Generate performance report from collected metrics.
 
+        Buffered samples are flushed first so the report covers every call.
+
         Returns:
             Dictionary containing aggregated performance statistics
         """
+        self._flush_metrics()
         report = {}
 
-        for func_name, metric_list in self.metrics.items():
-            if not metric_list:
-                continue
-
-            times = [m["execution_time_ms"] for m in metric_list]
-            memories = [m["memory_used_mb"] for m in metric_list]
-            successful = [m for m in metric_list if m["status"] == "success"]
+        for func_name, totals in self._totals.items():
+            n = totals["n"]
+            avg_time_ms = totals["sum_t"] / n
 
             report[func_name] = {
-                "total_calls": len(metric_list),
-                "successful_calls": len(successful),
-                "avg_time_ms": sum(times) / len(times),
-                "max_time_ms": max(times),
-                "min_time_ms": min(times),
-                "avg_memory_mb": sum(memories) / len(memories),
-                "max_memory_mb": max(memories),
-                "success_rate": len(successful) / len(metric_list) if metric_list else 0,
-                "slow_executions": sum(1 for t in times if t > self.slow_warning_threshold_ms)
+                "total_calls": n,
+                "successful_calls": totals["successful"],
+                "avg_time_ms": avg_time_ms,
+                "max_time_ms": totals["max_t"],
+                "min_time_ms": totals["min_t"],
+                "std_time_ms": max(totals["sum_t2"] / n - avg_time_ms ** 2, 0.0) ** 0.5,
+                "avg_memory_mb": totals["sum_m"] / totals["n_m"] if totals["n_m"] else None,
+                "max_memory_mb": totals["max_m"] if totals["n_m"] else None,
+                "success_rate": totals["successful"] / n,
+                "slow_executions": totals["slow"]
             }
 
         return report
@@ -241,8 +419,13 @@ class PerformanceProfiler:
 
         filepath = self.output_dir / filename
 
-        with open(filepath, 'w') as f:
-            json.dump(report, f, indent=2)
+        if ORJSON_AVAILABLE:
+            payload = orjson.dumps(report, option=orjson.OPT_INDENT_2)
+        else:
+            payload = json.dumps(report, indent=2).encode()
+
+        with open(filepath, 'wb', buffering=1 << 20) as f:
+            f.write(payload)
 
         self.logger.info(f"Performance report saved to: {filepath}")
         return str(filepath)
@@ -255,22 +438,29 @@ class PerformanceProfiler:
 
         report = self.generate_report()
 
-        print("\n" + "="*80)
-        print("PERFORMANCE PROFILING SUMMARY")
-        print("="*80)
+        # Assemble the whole summary and write it to stdout in one call
+        buf = io.StringIO()
+        buf.write("\n" + "="*80 + "\n")
+        buf.write("PERFORMANCE PROFILING SUMMARY\n")
+        buf.write("="*80 + "\n")
 
         for func_name, stats in report.items():
-            print(f"\n{func_name}:")
-            print(f"  Total Calls: {stats['total_calls']}")
-            print(f"  Success Rate: {stats['success_rate']:.2%}")
-            print(f"  Avg Time: {stats['avg_time_ms']:.2f}ms")
-            print(f"  Min/Max Time: {stats['min_time_ms']:.2f}ms / {stats['max_time_ms']:.2f}ms")
-            print(f"  Avg Memory: {stats['avg_memory_mb']:.2f}MB")
-            print(f"  Slow Executions: {stats['slow_executions']}")
-
-        print("\n" + "="*80 + "\n")
+            buf.write(f"\n{func_name}:\n")
+            buf.write(f"  Total Calls: {stats['total_calls']}\n")
+            buf.write(f"  Success Rate: {stats['success_rate']:.2%}\n")
+            buf.write(f"  Avg Time: {stats['avg_time_ms']:.2f}ms\n")
+            buf.write(f"  Min/Max Time: {stats['min_time_ms']:.2f}ms / {stats['max_time_ms']:.2f}ms\n")
+            if stats['avg_memory_mb'] is not None:
+                buf.write(f"  Avg Memory: {stats['avg_memory_mb']:.2f}MB\n")
+            buf.write(f"  Slow Executions: {stats['slow_executions']}\n")
+
+        buf.write("\n" + "="*80 + "\n\n")
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
 
     def clear_metrics(self) -> None:
-        """Clear all recorded metrics."""
+        """Clear all recorded metrics (samples already in metrics.jsonl are kept)."""
         self.metrics.clear()
+        self._totals.clear()
+        self._pending = 0
         self.logger.info("Performance metrics cleared")
@@ -4,14 +4,17 @@
 """Register 5G network management tools as NAT function groups."""
 
 import asyncio
+import contextlib
+import functools
 import logging
 import os
+import re
 import subprocess
+import time
 from collections.abc import AsyncGenerator
 from typing import Optional
 
 import gpudb
-import pandas as pd
 from dotenv import find_dotenv, load_dotenv
 from pydantic import BaseModel, Field
 
@@ -22,21 +25,24 @@ from nat.data_models.function import FunctionGroupBaseConfig
 
 # Try to import Phoenix tracing - make it optional
 try:
-    import phoenix as px
     from phoenix.otel import register
     from openinference.instrumentation.langchain import LangChainInstrumentor
+    from nat_5g_slicing.phoenix_setup import launch_phoenix_app
 
-    # Launch Phoenix UI server
-    px.launch_app()
+    # Launch Phoenix UI server (shared with phoenix_setup, so it only starts once)
+    launch_phoenix_app()
 
     # Register Phoenix tracing with modern OTEL approach
     tracer_provider = register(
         project_name="5g-network-agent",
         endpoint="http://0.0.0.0:6006",
+        batch=True,  # export spans in the background instead of on every span end
     )
 
-    # Instrument LangChain to capture traces
-    LangChainInstrumentor().instrument(tracer_provider=tracer_provider)
+    # Instrument LangChain to capture traces (skip if already instrumented)
+    instrumentor = LangChainInstrumentor()
+    if not instrumentor.is_instrumented_by_opentelemetry:
+        instrumentor.instrument(tracer_provider=tracer_provider)
 
     PHOENIX_TRACING_AVAILABLE = True
     logging.info("Phoenix tracing and LangChain instrumentation initialized successfully")
@@ -115,6 +121,19 @@ class NetworkManagementToolsConfig(FunctionGroupBaseConfig, name="network_tools"
         default="../llm-slicing-5g-lab/docker/change_rc_slice_docker.sh",
         description="Path to network reconfiguration script"
     )
+    packetloss_window_seconds: int = Field(
+        default=60,
+        description="Only packet loss rows from this many most recent seconds are queried"
+    )
+    reconfig_settle_seconds: float = Field(
+        default=3.0,
+        ge=0.0,
+        description="Minimum time after a reconfiguration before new packet loss rows count as reflecting it"
+    )
+    max_concurrency: int = Field(
+        default=8,
+        description="Maximum number of tool calls executed at once; further calls wait in a queue"
+    )
 
     # Profiling Configuration
     profiling_enabled: bool = Field(
@@ -129,6 +148,12 @@ class NetworkManagementToolsConfig(FunctionGroupBaseConfig, name="network_tools"
         default=5000.0,
         description="Threshold in ms for slow execution warnings"
     )
+    profiling_sample_rate: float = Field(
+        default=1.0,
+        ge=0.0,
+        le=1.0,
+        description="Fraction of tool calls that are profiled; the rest skip the profiler entirely"
+    )
 
     # Guardrails Configuration
     guardrails_enabled: bool = Field(
@@ -167,6 +192,129 @@ class NetworkManagementToolsConfig(FunctionGroupBaseConfig, name="network_tools"
 # Function Group Registration
 # =============================================================================
 
+# Back-to-back get_packetloss_logs calls within this many seconds share one query
+PACKETLOSS_CACHE_TTL_S = 3.0
+
+# The allocation table, table-name pattern and .env reload below mirror agentic-llm/tools.py.
+# This package is installed on its own and cannot import that module, so keep the copies in sync.
+
+# Slice ratios applied by reconfigure_network, keyed by the UE that needs the bandwidth
+ALLOCATIONS = {
+    "UE1": ("80", "20"),
+    "UE2": ("20", "80"),
+}
+
+# Accepted shape for table names that get interpolated into SQL
+_TABLE_NAME_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?")
+
+# .env is located on first use and afterwards only re-read when its modification time
+# changes (the lab rewrites IPERF3_RANDOM_TABLE_NAME there on every restart)
+_dotenv_path: Optional[str] = None
+_dotenv_mtime: Optional[int] = None
+
+
+def _reload_dotenv() -> None:
+    """Load .env if it changed since the last load; reloads override the earlier values."""
+    global _dotenv_path, _dotenv_mtime
+    if _dotenv_path is None:
+        _dotenv_path = find_dotenv()
+    if not _dotenv_path:
+        return
+    try:
+        mtime = os.stat(_dotenv_path).st_mtime_ns
+    except OSError:
+        return
+    if mtime != _dotenv_mtime:
+        load_dotenv(_dotenv_path, override=_dotenv_mtime is not None)
+        _dotenv_mtime = mtime
+
+
+class _KineticaPool:
+    """Bounded pool of Kinetica clients shared by concurrent tool calls.
+
+    Clients are opened lazily, up to size, and handed out through an asyncio.Queue
+    that is created inside the event loop using the pool.
+    """
+
+    def __init__(self, host: str, username: str, password: str, size: int):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.size = size
+        self._opened = 0
+        self._idle: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _idle_queue(self) -> asyncio.Queue:
+        """Idle clients for the running loop; they carry over if the pool moves to a new loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            idle: asyncio.Queue = asyncio.Queue()
+            while self._idle is not None and not self._idle.empty():
+                idle.put_nowait(self._idle.get_nowait())
+            self._idle, self._loop = idle, loop
+        return self._idle
+
+    def _connect(self) -> gpudb.GPUdb:
+        kdbc_options = gpudb.GPUdb.Options()
+        kdbc_options.username = self.username
+        kdbc_options.password = self.password
+        kdbc_options.disable_auto_discovery = True
+        return gpudb.GPUdb(host=self.host, options=kdbc_options)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        """Borrow a client for the duration of an `async with` block."""
+        idle = self._idle_queue()
+        if idle.empty() and self._opened < self.size:
+            self._opened += 1
+            try:
+                kdbc = await asyncio.to_thread(self._connect)
+            except Exception:
+                self._opened -= 1
+                raise
+        else:
+            kdbc = await idle.get()
+
+        try:
+            yield kdbc
+        finally:
+            self._idle_queue().put_nowait(kdbc)
+
+
+# Kinetica pools keyed by (host, username, password, size), reused whenever NAT rebuilds
+# the group with the same settings
+_KDBC_CACHE: dict[tuple[str, str, str, int], _KineticaPool] = {}
+
+
+def _get_kdbc_pool(host: str, username: str, password: str, size: int) -> _KineticaPool:
+    """Return the cached Kinetica pool for these settings, creating it on first use."""
+    key = (host, username, password, size)
+    pool = _KDBC_CACHE.get(key)
+    if pool is None:
+        pool = _KDBC_CACHE.setdefault(key, _KineticaPool(host, username, password, size))
+    return pool
+
+
+async def _run_script(script_path: str, args: list[str]) -> str:
+    """Run a shell script without blocking the event loop.
+
+    Raises:
+        subprocess.CalledProcessError: If the script exits with a non-zero status
+    """
+    proc = await asyncio.create_subprocess_exec(
+        script_path, *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(
+            proc.returncode, [script_path, *args], output=stdout.decode(), stderr=stderr.decode()
+        )
+    return stdout.decode()
+
+
 @register_function_group(config_type=NetworkManagementToolsConfig)
 async def network_tools(
     config: NetworkManagementToolsConfig,
@@ -174,7 +322,7 @@ async def network_tools(
 ) -> AsyncGenerator[FunctionGroup, None]:
     """Create and register the 5G network management function group."""
 
-    load_dotenv(find_dotenv())
+    _reload_dotenv()
 
     # Phoenix tracing is already initialized via phoenix.otel.register() at module level (line 25-29)
     # The legacy setup_phoenix_tracing() call has been removed to fix 405 "Method Not Allowed" errors
@@ -207,19 +355,105 @@ async def network_tools(
             logging.info(f"  Service: {config.phoenix_service_name}")
             logging.info(f"  Environment: {config.phoenix_environment}")
 
-    # Initialize Kinetica connection
-    kdbc_options = gpudb.GPUdb.Options()
-    kdbc_options.username = os.getenv("KINETICA_USERNAME", config.kinetica_username)
-    kdbc_options.password = os.getenv("KINETICA_PASSWORD", config.kinetica_password)
-    kdbc_options.disable_auto_discovery = True
-
-    kdbc = gpudb.GPUdb(
+    # Initialize Kinetica connections (shared across group rebuilds); one per
+    # concurrently running tool call is enough
+    kdbc_pool = _get_kdbc_pool(
         host=os.getenv("KINETICA_HOST", config.kinetica_host),
-        options=kdbc_options
+        username=os.getenv("KINETICA_USERNAME", config.kinetica_username),
+        password=os.getenv("KINETICA_PASSWORD", config.kinetica_password),
+        size=config.max_concurrency
     )
 
+    def _table_name() -> str:
+        """Current iperf table, following .env changes (the lab picks a new one on restart).
+
+        It is interpolated into SQL, so only a plain [schema.]table name is accepted.
+        """
+        _reload_dotenv()
+        table_name = os.getenv("IPERF3_RANDOM_TABLE_NAME", config.iperf_table_name)
+        if not _TABLE_NAME_PATTERN.fullmatch(table_name):
+            raise ValueError(f"Invalid iperf table name: {table_name!r}")
+        return table_name
+
+    # Fail at build time on a bad configured name rather than on the first call
+    _table_name()
+
+    # Constant statement text per table so Kinetica can reuse its plan; the row count
+    # is passed as the request limit instead of being spliced into the SQL.
+    # The time predicate lets Kinetica prune to recent data before sorting
+    packetloss_sql = f"""
+        SELECT lost_packets, loss_percentage, UE
+        FROM {{table}}
+        WHERE timestamp > NOW() - INTERVAL '{int(config.packetloss_window_seconds)}' SECOND
+        ORDER BY timestamp DESC
+    """
+
     group = FunctionGroup(config=config)
 
+    # Bound concurrent tool calls so bursts of requests queue up instead of
+    # all hitting Kinetica and the reconfiguration script at the same time
+    call_slots = asyncio.Semaphore(config.max_concurrency)
+
+    def _queued(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            async with call_slots:
+                return await fn(*args, **kwargs)
+        return wrapper
+
+    latest_sql = "SELECT MAX(timestamp) AS latest FROM {table}"
+
+    # Recent get_packetloss_logs outputs by (table, limit): (time.monotonic() when stored, output),
+    # and the queries currently running for each key
+    packetloss_cache: dict[tuple[str, int], tuple[float, str]] = {}
+    packetloss_inflight: dict[tuple[str, int], asyncio.Task] = {}
+
+    def _finish_packetloss_fetch(key: tuple[str, int], task: asyncio.Task) -> None:
+        """Retire a finished query and cache its output if it succeeded."""
+        packetloss_inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            packetloss_cache[key] = (time.monotonic(), task.result())
+
+    async def _latest_timestamp():
+        """Timestamp of the newest iperf row, as reported by Kinetica."""
+        statement = latest_sql.format(table=_table_name())
+        async with kdbc_pool.acquire() as kdbc:
+            response = await asyncio.to_thread(kdbc.execute_sql_and_decode, statement=statement)
+        records = response.get("records") if response else None
+        return records[0]["latest"] if records else None
+
+    async def _wait_for_fresh_rows(ceiling_s: float, settle_s: float = 0.0) -> bool:
+        """Poll with exponential backoff until a new iperf row lands, up to ceiling_s seconds.
+
+        With settle_s, only rows that land more than settle_s seconds after the call count:
+        the newest row is taken as the baseline once the settle time has passed. Compares
+        against the server's own timestamps, so client/DB clock skew does not matter.
+        """
+        waited = min(settle_s, ceiling_s)
+        if waited:
+            await asyncio.sleep(waited)
+        try:
+            baseline = await _latest_timestamp()
+        except Exception as e:
+            logging.warning(f"Readiness check unavailable, waiting {ceiling_s - waited}s: {e}")
+            await asyncio.sleep(ceiling_s - waited)
+            return False
+
+        delay = 0.1
+        while waited < ceiling_s:
+            delay = min(delay, ceiling_s - waited)
+            await asyncio.sleep(delay)
+            waited += delay
+            try:
+                if await _latest_timestamp() != baseline:
+                    logging.info(f"Fresh iperf data after {waited:.1f}s")
+                    return True
+            except Exception as e:
+                logging.debug(f"Readiness poll failed: {e}")
+            delay *= 2
+
+        return False
+
     # -------------------------------------------------------------------------
     # Tool Functions (single Pydantic model input)
     # -------------------------------------------------------------------------
@@ -254,32 +488,21 @@ async def network_tools(
         args_1 = ["20", "20"]
 
         # Determine new allocation based on UE
-        if input.ue.upper() == "UE1":
-            args_2 = ["80", "20"]
-        else:
-            args_2 = ["20", "80"]
+        try:
+            args_2 = list(ALLOCATIONS[input.ue.upper()])
+        except KeyError:
+            raise ValueError(f"Unknown UE {input.ue!r}, expected one of {', '.join(ALLOCATIONS)}") from None
 
         try:
-            # Execute first reconfiguration
-            result = subprocess.run(
-                [script_path] + args_1,
-                check=True,
-                text=True,
-                capture_output=True
-            )
-            logging.info(f"Script output args_1: {result.stdout}")
-
-            # Execute second reconfiguration
-            result = subprocess.run(
-                [script_path] + args_2,
-                check=True,
-                text=True,
-                capture_output=True
-            )
-            logging.info(f"Script output args_2: {result.stdout}")
+            # Reset to args_1, then apply args_2, in a single script run
+            stdout = await _run_script(script_path, args_1 + args_2)
+            logging.info(f"Script output args_1 + args_2: {stdout}")
 
-            await asyncio.sleep(10)
             logging.info("Reconfiguration complete, waiting for changes to take effect")
+            # Rows stamped before the slice change settled still show the old allocation
+            await _wait_for_fresh_rows(ceiling_s=max(10.0, config.reconfig_settle_seconds + 2.0),
+                                       settle_s=config.reconfig_settle_seconds)
+            packetloss_cache.clear()  # cached logs predate the new allocation
 
             output = str(args_2)
 
@@ -297,46 +520,25 @@ async def network_tools(
             logging.error(f"Reconfiguration failed: {e.stderr}")
             raise ValueError(f"Reconfiguration unsuccessful: {e.stderr}")
 
-    async def _get_packetloss_logs(input: GetPacketlossLogsInput = None) -> str:
-        """Get packet loss logs from Kinetica database to determine which UE is failing.
-
-        Args:
-            input: GetPacketlossLogsInput containing limit for number of entries
-
-        Returns:
-            Formatted string containing recent packet loss data for all UEs
-        """
-        if input is None:
-            input = GetPacketlossLogsInput()
-
-        # Input validation with guardrails
-        if input_validator:
-            is_valid, issues = input_validator.validate_packetloss_input(limit=input.limit)
-            if not is_valid:
-                error_msg = f"[GUARDRAIL] Invalid input: {'; '.join(issues)}"
-                logging.error(error_msg)
-                raise ValueError(error_msg)
-
-        logging.info(f"[EXECUTING] get_packetloss_logs with limit={input.limit}")
-
-        await asyncio.sleep(5)
-
-        load_dotenv(find_dotenv())
-        table_name = os.getenv("IPERF3_RANDOM_TABLE_NAME", config.iperf_table_name)
-
-        sql_query = f"""
-            SELECT lost_packets, loss_percentage, UE
-            FROM {table_name}
-            ORDER BY timestamp DESC
-            LIMIT {input.limit};
-        """
+    async def _fetch_packetloss_logs(table_name: str, limit: int) -> str:
+        """Wait for fresh data, query the latest packet loss rows and format them for the LLM."""
+        await _wait_for_fresh_rows(ceiling_s=5)
 
         try:
-            response = kdbc.execute_sql_and_decode(statement=sql_query)
+            async with kdbc_pool.acquire() as kdbc:
+                response = await asyncio.to_thread(
+                    kdbc.execute_sql_and_decode, statement=packetloss_sql.format(table=table_name), limit=limit
+                )
 
             if response and "records" in response and response["records"]:
-                result_df = pd.DataFrame(response["records"])
-                output = result_df.to_string(index=False)
+                records = response["records"]
+                # Plain CSV straight from the records; column order comes from the
+                # first record (names are as Kinetica reports them)
+                columns = list(records[0])
+                output = ",".join(columns) + "\n" + "".join(
+                    ",".join([str(record[column]) for column in columns]) + "\n"
+                    for record in records
+                )
 
                 # Output validation
                 if output_validator:
@@ -359,6 +561,45 @@ async def network_tools(
             logging.error(f"Failed to retrieve packet loss logs: {e}")
             raise ValueError(f"Failed to query Kinetica database: {e}")
 
+    async def _get_packetloss_logs(input: GetPacketlossLogsInput = None) -> str:
+        """Get packet loss logs from Kinetica database to determine which UE is failing.
+
+        Args:
+            input: GetPacketlossLogsInput containing limit for number of entries
+
+        Returns:
+            Formatted string containing recent packet loss data for all UEs
+        """
+        if input is None:
+            input = GetPacketlossLogsInput()
+
+        # Input validation with guardrails
+        if input_validator:
+            is_valid, issues = input_validator.validate_packetloss_input(limit=input.limit)
+            if not is_valid:
+                error_msg = f"[GUARDRAIL] Invalid input: {'; '.join(issues)}"
+                logging.error(error_msg)
+                raise ValueError(error_msg)
+
+        logging.info(f"[EXECUTING] get_packetloss_logs with limit={input.limit}")
+
+        table_name = _table_name()
+        key = (table_name, input.limit)
+        cached = packetloss_cache.get(key)
+        if cached and time.monotonic() - cached[0] < PACKETLOSS_CACHE_TTL_S:
+            logging.info("get_packetloss_logs served from cache")
+            return cached[1]
+
+        # Single flight: concurrent callers with the same table and limit await one shared query
+        task = packetloss_inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(_fetch_packetloss_logs(table_name, input.limit))
+            packetloss_inflight[key] = task
+            task.add_done_callback(functools.partial(_finish_packetloss_fetch, key))
+
+        # Shielded so one cancelled caller does not cancel the query for the others
+        return await asyncio.shield(task)
+
     # -------------------------------------------------------------------------
     # Register functions with profiling
     # -------------------------------------------------------------------------
@@ -367,12 +608,14 @@ async def network_tools(
     if profiler:
         _reconfigure_network_profiled = profiler.profile_function(
             track_memory=True,
-            slow_warning_ms=config.slow_warning_threshold_ms
+            slow_warning_ms=config.slow_warning_threshold_ms,
+            sample_rate=config.profiling_sample_rate
         )(_reconfigure_network)
 
         _get_packetloss_logs_profiled = profiler.profile_function(
             track_memory=True,
-            slow_warning_ms=3000  # Lower threshold for log retrieval
+            slow_warning_ms=3000,  # Lower threshold for log retrieval
+            sample_rate=config.profiling_sample_rate
         )(_get_packetloss_logs)
     else:
         _reconfigure_network_profiled = _reconfigure_network
@@ -381,24 +624,27 @@ async def network_tools(
     if "reconfigure_network" in config.include:
         group.add_function(
             name="reconfigure_network",
-            fn=_reconfigure_network_profiled,
+            fn=_queued(_reconfigure_network_profiled),
             description="Reconfigure the 5G network bandwidth allocation for a specific UE"
         )
 
     if "get_packetloss_logs" in config.include:
         group.add_function(
             name="get_packetloss_logs",
-            fn=_get_packetloss_logs_profiled,
+            fn=_queued(_get_packetloss_logs_profiled),
             description="Get packet loss logs from Kinetica database to determine which UE is failing"
         )
 
-    yield group
-
-    # Generate profiling report on shutdown if profiler is enabled
-    if profiler:
-        try:
-            report_path = profiler.save_report()
-            logging.info(f"Performance profiling report saved: {report_path}")
-            profiler.print_summary()
-        except Exception as e:
-            logging.error(f"Failed to save profiling report: {e}")
\ No newline at end of file
+    try:
+        yield group
+    finally:
+        # Generate profiling report on shutdown if profiler is enabled
+        if profiler:
+            try:
+                report_path = profiler.save_report()
+                logging.info(f"Performance profiling report saved: {report_path}")
+                profiler.print_summary()
+            except Exception as e:
+                logging.error(f"Failed to save profiling report: {e}")
+            finally:
+                profiler.close()
\ No newline at end of file
@@ -15,34 +15,37 @@
 
 # This file defines the tools that are used by the agents.
 
-import pandas as pd
+import asyncio
+import functools
 import time
 import os
+import re
 from langchain_core.tools import tool
 import subprocess
 import yaml
 import logging
 from dotenv import load_dotenv, find_dotenv
-import gpudb
+from kinetica_utils import KineticaPool
+
+
+@functools.cache
+def load_config() -> dict:
+    """Parse config.yaml once per process, using the libyaml loader when available."""
+    with open('config.yaml', 'rb') as f:
+        return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
 
 
-config_file = yaml.safe_load(open('config.yaml', 'r'))
 # Configure the logger without timestamp and level tags
 logging.basicConfig(
-    filename= config_file['AGENT_LOG_FILE'],  # Log file name
+    filename= load_config()['AGENT_LOG_FILE'],  # Log file name
     level=logging.INFO,   # Log level
     format="%(message)s",  # Only log the message
     force=True  # Override any existing logging config
 )
 
-# Get the root logger and disable buffering
 logger = logging.getLogger()
 for handler in logger.handlers:
     handler.setLevel(logging.INFO)
-    handler.flush()
-    # Force immediate flush after each log by disabling buffering
-    if hasattr(handler, 'stream'):
-        handler.stream.reconfigure(line_buffering=True)
 
 # Configure for Kinetica instance (use container IP when running in Docker)
 os.environ["KINETICA_HOST"] = os.getenv("KINETICA_HOST", "192.168.70.172:9191")
@@ -50,77 +53,133 @@ os.environ["KINETICA_USERNAME"] = os.getenv("KINETICA_USERNAME", "admin")
 os.environ["KINETICA_PASSWORD"] = os.getenv("KINETICA_PASSWORD", "admin")
 os.environ["KINETICA_SCHEMA"] = os.getenv("KINETICA_SCHEMA", "nvidia_gtc_dli_2025")
 
-kdbc_options = gpudb.GPUdb.Options()
-kdbc_options.username = os.environ.get("KINETICA_USERNAME")
-kdbc_options.password = os.environ.get("KINETICA_PASSWORD")
-kdbc_options.disable_auto_discovery = True
-kdbc: gpudb.GPUdb = gpudb.GPUdb(
+# Shared by the tools and the agents; each query borrows a connection for its duration
+kinetica_pool = KineticaPool(
     host=os.environ.get("KINETICA_HOST"),
-    options=kdbc_options
+    username=os.environ.get("KINETICA_USERNAME"),
+    password=os.environ.get("KINETICA_PASSWORD")
 )
 
+# The .env reload, ALLOCATIONS and TABLE_NAME_PATTERN are mirrored in nat_wrapper/src/nat_5g_slicing/register.py,
+# which is installed as a separate package and cannot import this module. Keep the copies in sync.
+
+# .env is located once; afterwards it is only re-read when its modification time changes
+DOTENV_PATH = find_dotenv()
+_dotenv_mtime = None
+
+
+def reload_dotenv():
+    """Load .env again if it changed since the last load"""
+    global _dotenv_mtime
+    if not DOTENV_PATH:
+        return
+    try:
+        mtime = os.stat(DOTENV_PATH).st_mtime_ns
+    except OSError:
+        return
+    if mtime != _dotenv_mtime:
+        # Later loads override, otherwise a rewritten value would never replace the first one
+        load_dotenv(DOTENV_PATH, override=_dotenv_mtime is not None)
+        _dotenv_mtime = mtime
+
+
+# Slice ratios applied by reconfigure_network, keyed by the UE that needs the bandwidth
+ALLOCATIONS = {
+    "UE1": ("80", "20"),
+    "UE2": ("20", "80"),
+}
+
+# Accepted shape for table names that get interpolated into SQL
+TABLE_NAME_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?")
+
+
+async def _run_script(script_path, args, timeout=30):
+    """
+    Run the reconfiguration script without blocking the event loop
+
+    The script writes its stdout/stderr straight into the agent log file, so its output
+    never passes through Python. Raises subprocess.TimeoutExpired / subprocess.CalledProcessError
+    like subprocess.run(check=True)
+    """
+    cmd = [script_path] + args
+    # Make sure our own log lines land before the script's output
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+    with open(load_config()['AGENT_LOG_FILE'], 'ab') as log_file:
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=log_file, stderr=log_file)
+        try:
+            await asyncio.wait_for(proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
 
 @tool
-def reconfigure_network(UE: str, value_1_old: int, value_2_old: int):
+async def reconfigure_network(UE: str, value_1_old: int, value_2_old: int):
     """
     Use this tool to reconfigure the network. The tool reconfigures network, and returns new configuration values.
     """
-    time.sleep(2) #to improve logging
+    await asyncio.sleep(2) #to improve logging
     logging.info(f"This is reconfigure_network Tool \n")
     logging.info(f"\n Executing reconfigure_network with UE={UE}, value_1_old={value_1_old}, value_2_old={value_2_old} \n")
-    script_path = config_file['reconfig_script_path']
+    script_path = load_config()['reconfig_script_path']
     config_value_1 = "20"
     config_value_2 = "80"
-    args_1 = args_2 = None
     args_1 = ["20", "20"]
-    
-    if UE == "UE1":
-       args_2 = ["80","20"]
-    else: 
-       args_2 = ["20","80"]
- 
+
+    allocation = ALLOCATIONS.get(UE.upper())
+    if allocation is None:
+        logging.info(f"\n❌ Error: unknown UE {UE!r}, expected one of {', '.join(ALLOCATIONS)}\n")
+        return "Reconfiguration unsuccessful - unknown UE"
+    args_2 = list(allocation)
+
     try:
-        logging.info(f"\n🔄 Running reconfiguration step 1 with args: {args_1}\n")
-        result = subprocess.run([script_path] + args_1, check=True, text=True, capture_output=True, timeout=30)
-        logging.info("\n✅ Script output args_1:\n")
-        logging.info(result.stdout)
-        if result.stderr:
-            logging.info("Script stderr args_1:")
-            logging.info(result.stderr)
-
-        if args_2!=None:
-          logging.info(f"\n🔄 Running reconfiguration step 2 with args: {args_2}\n")
-          result = subprocess.run([script_path] + args_2, check=True, text=True, capture_output=True, timeout=30)
-          logging.info("\n✅ Script output args_2:\n")
-          logging.info(result.stdout)
-          if result.stderr:
-              logging.info("Script stderr args_2:")
-              logging.info(result.stderr)
-
-        time.sleep(10)
-        logging.info("\n⏳ Wait for reconfiguration to kick in \n")
-        if args_2 != None:
-            return str(args_2)
+        # The script applies each ratio pair in order, so both steps share one run
+        logging.info(f"\n🔄 Running reconfiguration steps with args: {args_1} then {args_2}\n")
+        logging.info("\nScript output:\n")
+        await _run_script(script_path, args_1 + args_2)
+        logging.info("\n✅ Reconfiguration script finished\n")
 
-        return str(args_1)
+        await asyncio.sleep(10)
+        logging.info("\n⏳ Wait for reconfiguration to kick in \n")
+        return str(args_2)
     except subprocess.TimeoutExpired as e:
         logging.info(f"\n❌ Error: Script timed out after 30 seconds\n")
-        logging.info(f"Command: {e.cmd}\n")
-        if e.stdout:
-            logging.info(f"Stdout before timeout:\n{e.stdout}\n")
-        if e.stderr:
-            logging.info(f"Stderr before timeout:\n{e.stderr}\n")
+        logging.info(f"Command: {e.cmd} (script output before the timeout is above)\n")
         return "Reconfiguration unsuccessful - timeout"
     except subprocess.CalledProcessError as e:
         logging.info(f"\n❌ Error occurred during reconfiguration:\n")
-        logging.info(f"Return code: {e.returncode}\n")
-        if e.stdout:
-            logging.info(f"Stdout:\n{e.stdout}\n")
-        if e.stderr:
-            logging.info(f"Stderr:\n{e.stderr}\n")
+        logging.info(f"Return code: {e.returncode} (script output is above)\n")
         return "Reconfiguration unsuccessful"
 
 
+def wait_for_fresh_data(table_name, max_wait=5, poll_interval=0.5, fresh_within=2):
+    """
+    Wait until the newest row in table_name is at most fresh_within seconds old, up to max_wait seconds
+
+    The age is computed by Kinetica itself, so client/server clock skew does not matter
+    """
+    sql_query = f"SELECT TIMESTAMPDIFF(SECOND, MAX(timestamp), NOW()) AS age FROM {table_name}"
+    deadline = time.monotonic() + max_wait
+    while True:
+        try:
+            with kinetica_pool.acquire() as kdbc:
+                records = kdbc.execute_sql_and_decode(statement=sql_query)["records"]
+            age = records[0]["age"] if records else None
+            if age is not None and age <= fresh_within:
+                return True
+        except Exception as e:
+            logging.debug(f"Freshness check failed: {e}")
+        if time.monotonic() + poll_interval > deadline:
+            return False
+        time.sleep(poll_interval)
+
+
 @tool
 def get_packetloss_logs() -> str:
     """
@@ -130,37 +189,47 @@ def get_packetloss_logs() -> str:
     time.sleep(2) #to improve logging
     logging.info(f"This is get_packetloss_logs Tool \n")
     logging.info("\nRetrieving packet loss logs from database (FIXED: time-based filtering)\n")
-    time.sleep(5) # wait for db to get updated
-    iperf_random_table_name: str = os.getenv('IPERF3_RANDOM_TABLE_NAME')
     # Just to be sure we have the latest randomly generated table name
-    load_dotenv(find_dotenv())
+    reload_dotenv()
+
+    # The table name is interpolated into SQL, so it must be a plain [schema.]table identifier
+    table_name = os.getenv('IPERF3_RANDOM_TABLE_NAME')
+    if not table_name or not TABLE_NAME_PATTERN.fullmatch(table_name):
+        return f"WARNING: Invalid iperf table name {table_name!r}. Please check IPERF3_RANDOM_TABLE_NAME."
+
+    wait_for_fresh_data(table_name) # wait for db to get updated
 
     # FIXED: Use time-based filtering instead of LIMIT to avoid stale data
-    # This matches the MonitoringAgent's 30-second window
+    # This matches the MonitoringAgent's 30-second window.
+    # No per-call values in the statement, so Kinetica reuses its plan.
+    # Aggregated per UE in the database, so only one row per UE comes back
     sql_query = f"""
-    SELECT lost_packets, loss_percentage, UE, timestamp
-    FROM {os.getenv('IPERF3_RANDOM_TABLE_NAME')}
+    SELECT ue, AVG(loss_percentage) AS loss_mean, MAX(loss_percentage) AS loss_max,
+           MIN(loss_percentage) AS loss_min, SUM(lost_packets) AS lost_packets, COUNT(*) AS samples
+    FROM {table_name}
     WHERE timestamp > NOW() - INTERVAL '30' SECOND
-    ORDER BY timestamp DESC;
+    GROUP BY ue
+    ORDER BY ue;
     """
 
     logging.info(f"Query: {sql_query}")
-    result_df: pd.DataFrame = kdbc.to_df(
-        sql=sql_query
-    )
+    with kinetica_pool.acquire() as kdbc:
+        records = kdbc.execute_sql_and_decode(statement=sql_query)["records"]
 
-    if result_df is None or result_df.empty:
+    if not records:
         return "WARNING: A Problem has occurred. No results were found at this time. Please try again later."
 
-    logging.info(f"Retrieved {len(result_df)} records from last 30 seconds\n")
+    total_records = sum(r["samples"] for r in records)
+    logging.info(f"Retrieved {total_records} records from last 30 seconds\n")
 
     # Return summary instead of full dataframe to reduce log clutter
-    summary = result_df.groupby('UE').agg({
-        'loss_percentage': ['mean', 'max', 'min'],
-        'lost_packets': 'sum'
-    }).round(2)
-
-    summary_str = f"Packet Loss Summary (Last 30 seconds):\n{summary.to_string()}\n\n"
-    summary_str += f"Total records analyzed: {len(result_df)}"
+    lines = [f"{'UE':<6}{'loss_mean':>10}{'loss_max':>10}{'loss_min':>10}{'lost_packets':>14}"]
+    for r in records:
+        lines.append(
+            f"{r['ue']:<6}{r['loss_mean']:>10.2f}{r['loss_max']:>10.2f}{r['loss_min']:>10.2f}{r['lost_packets']:>14}"
+        )
+
+    summary_str = "Packet Loss Summary (Last 30 seconds):\n" + "\n".join(lines) + "\n\n"
+    summary_str += f"Total records analyzed: {total_records}"
 
     return summary_str
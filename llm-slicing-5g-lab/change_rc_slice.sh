@@ -17,6 +17,7 @@
 
 # 1 = slice 1 Ratio
 # 2 = slice 2 Ratio
+# Further pairs (3 4, 5 6, ...) are applied in order within the same run
 
 parent_path=$( cd "$(dirname "${BASH_SOURCE[0]}")" ; pwd -P )
 
@@ -31,12 +32,25 @@ if [ -n "$1" ] &&  [ -n "$2" ]; then
   #  exit()
   #fi
 
-  SLICE1_RATIO=$1
-  SLICE2_RATIO=$2
+  RATIOS=("$@")
+  if (( ${#RATIOS[@]} % 2 )); then
+    echo "Usage: $0 <slice1_ratio> <slice2_ratio> [<slice1_ratio> <slice2_ratio> ...]"
+    echo "Error: Ratios must be given in slice1/slice2 pairs"
+    exit 1
+  fi
+  for RATIO in "${RATIOS[@]}"; do
+    if ! [[ "$RATIO" =~ ^[0-9]+$ ]]; then
+      echo "Error: Ratios must be numeric values"
+      exit 1
+    fi
+    if (( 10#$RATIO > 100 )); then
+      echo "Error: Ratios must be between 0 and 100"
+      exit 1
+    fi
+  done
 else
   echo "You did not specify the slicing ratios, using default 80:20"
-  SLICE1_RATIO=80
-  SLICE2_RATIO=20
+  RATIOS=(80 20)
 fi
 
 # Create custom xApp config inside FlexRIC container (if not exists)
@@ -48,8 +62,12 @@ NEAR_RIC_IP = 127.0.0.1
 DB_DIR = /tmp/
 EOF'
 
-# Run xApp inside FlexRIC container with environment variables
-docker exec -e SLICE1_RATIO=$SLICE1_RATIO -e SLICE2_RATIO=$SLICE2_RATIO \
-  flexric /usr/local/bin/xapp_rc_slice_dynamic \
-  -c /tmp/xapp_flexric.conf \
-  -p /usr/local/lib/flexric/
+# Run xApp inside FlexRIC container with environment variables, once per ratio pair
+for ((i = 0; i < ${#RATIOS[@]}; i += 2)); do
+  SLICE1_RATIO=${RATIOS[i]}
+  SLICE2_RATIO=${RATIOS[i+1]}
+  docker exec -e SLICE1_RATIO=$SLICE1_RATIO -e SLICE2_RATIO=$SLICE2_RATIO \
+    flexric /usr/local/bin/xapp_rc_slice_dynamic \
+    -c /tmp/xapp_flexric.conf \
+    -p /usr/local/lib/flexric/
+done
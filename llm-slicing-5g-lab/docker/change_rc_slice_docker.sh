@@ -6,8 +6,9 @@
 # Docker-compatible script to change RC slice bandwidth allocation
 # This script executes the xApp inside the FlexRIC container
 #
-# Usage: ./change_rc_slice_docker.sh <slice1_ratio> <slice2_ratio>
+# Usage: ./change_rc_slice_docker.sh <slice1_ratio> <slice2_ratio> [<slice1_ratio> <slice2_ratio> ...]
 # Example: ./change_rc_slice_docker.sh 60 40
+# Several ratio pairs are applied in order, e.g. ./change_rc_slice_docker.sh 20 20 80 20
 
 set -e
 
@@ -15,26 +16,24 @@ CONTAINER_NAME="flexric"
 
 # Check if arguments are provided
 if [ -z "$1" ] || [ -z "$2" ]; then
-    echo "Usage: $0 <slice1_ratio> <slice2_ratio>"
+    echo "Usage: $0 <slice1_ratio> <slice2_ratio> [<slice1_ratio> <slice2_ratio> ...]"
     echo "Example: $0 60 40"
     exit 1
 fi
 
-SLICE1_RATIO=$1
-SLICE2_RATIO=$2
+RATIOS=("$@")
 
-# Validate that ratios are numbers
-if ! [[ "$SLICE1_RATIO" =~ ^[0-9]+$ ]] || ! [[ "$SLICE2_RATIO" =~ ^[0-9]+$ ]]; then
-    echo "Error: Ratios must be numeric values"
+# Validate that ratios are numbers and come in pairs
+if (( ${#RATIOS[@]} % 2 )); then
+    echo "Error: Ratios must be given in slice1/slice2 pairs"
     exit 1
 fi
-
-echo "================================================"
-echo "Changing Slice Bandwidth Allocation"
-echo "================================================"
-echo "Slice 1 Ratio: ${SLICE1_RATIO}%"
-echo "Slice 2 Ratio: ${SLICE2_RATIO}%"
-echo "================================================"
+for RATIO in "${RATIOS[@]}"; do
+    if ! [[ "$RATIO" =~ ^[0-9]+$ ]]; then
+        echo "Error: Ratios must be numeric values"
+        exit 1
+    fi
+done
 
 # Check if container is running
 if ! docker ps --format '{{.Names}}' | grep -q "^${CONTAINER_NAME}$"; then
@@ -43,11 +42,23 @@ if ! docker ps --format '{{.Names}}' | grep -q "^${CONTAINER_NAME}$"; then
     exit 1
 fi
 
-# Execute xApp inside the container
-echo "Executing xApp to reconfigure slices..."
-docker exec -e SLICE1_RATIO=${SLICE1_RATIO} -e SLICE2_RATIO=${SLICE2_RATIO} \
-    ${CONTAINER_NAME} \
-    /usr/local/bin/xapp_rc_slice_dynamic
+for ((i = 0; i < ${#RATIOS[@]}; i += 2)); do
+    SLICE1_RATIO=${RATIOS[i]}
+    SLICE2_RATIO=${RATIOS[i+1]}
+
+    echo "================================================"
+    echo "Changing Slice Bandwidth Allocation"
+    echo "================================================"
+    echo "Slice 1 Ratio: ${SLICE1_RATIO}%"
+    echo "Slice 2 Ratio: ${SLICE2_RATIO}%"
+    echo "================================================"
+
+    # Execute xApp inside the container
+    echo "Executing xApp to reconfigure slices..."
+    docker exec -e SLICE1_RATIO=${SLICE1_RATIO} -e SLICE2_RATIO=${SLICE2_RATIO} \
+        ${CONTAINER_NAME} \
+        /usr/local/bin/xapp_rc_slice_dynamic
+done
 
 echo "================================================"
 echo "Slice reconfiguration completed successfully"
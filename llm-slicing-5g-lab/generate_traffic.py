@@ -1,28 +1,41 @@
 #!/usr/bin/env python3
 # FINAL FIXED VERSION - Real-time streaming traffic generator with auto-detection
-import os, re, subprocess, threading, time, logging, random
-from datetime import datetime
-from typing import Pattern
+import asyncio, collections, concurrent.futures, ipaddress, os, queue, subprocess, threading, time, logging, random
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+def read_ue_ip(namespace: str, interface: str):
+    """
+    Return the /24 IPv4 address of interface inside the namespace, or None
+
+    'ip -o -4' prints one line per address, e.g.
+    "3: oaitun_ue1    inet 12.1.1.3/24 brd 12.1.1.255 scope global oaitun_ue1 ...",
+    so the address is always the fourth field. Raises like subprocess.run on timeout.
+    """
+    result = subprocess.run(
+        ["sudo", "ip", "netns", "exec", namespace, "ip", "-o", "-4", "addr", "show", "dev", interface],
+        capture_output=True,
+        text=True,
+        timeout=5
+    )
+    if result.returncode != 0:
+        return None
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if len(fields) > 3 and fields[2] == "inet":
+            ip, _, prefix = fields[3].partition("/")
+            if prefix == "24":
+                return ip
+    return None
+
 def get_ue_ip(namespace: str = "ue1", interface: str = "oaitun_ue1") -> str:
     """Auto-detect UE IP address from the namespace (UPDATED FOR NAMESPACES)"""
     try:
-        result = subprocess.run(
-            ["sudo", "ip", "netns", "exec", namespace, "ip", "addr", "show", interface],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            # Parse IP address from output like: "inet 12.1.1.3/24 brd ..."
-            for line in result.stdout.split('\n'):
-                if 'inet ' in line and '/24' in line:
-                    ip = line.strip().split()[1].split('/')[0]
-                    logger.info(f"✅ Auto-detected UE IP: {ip}")
-                    return ip
+        ip = read_ue_ip(namespace, interface)
+        if ip:
+            logger.info(f"✅ Auto-detected UE IP: {ip}")
+            return ip
     except Exception as e:
         logger.error(f"Failed to auto-detect UE IP: {e}")
 
@@ -109,39 +122,214 @@ except Exception as e:
 
 # Initialize InfluxDB
 try:
-    from influxdb_client import InfluxDBClient, Point
-    from influxdb_client.client.write_api import SYNCHRONOUS
+    from influxdb_client import InfluxDBClient, WritePrecision
+    from influxdb_client.client.write_api import WriteOptions
     influx_client = InfluxDBClient(url="http://localhost:9001", token="5g-lab-token", org="5g-lab")
-    influx_write_api = influx_client.write_api(write_options=SYNCHRONOUS)
+    # Batching writer: points are coalesced in the background and posted every 500 points or 1s
+    influx_write_api = influx_client.write_api(write_options=WriteOptions(
+        batch_size=500, flush_interval=1_000, jitter_interval=200, retry_interval=5_000
+    ))
     logger.info("✅ Connected to InfluxDB")
 except Exception as e:
     logger.warning(f"⚠️  InfluxDB not available: {e}")
     influx_write_api = None
 
-# Regex for iperf3 output
-pattern: Pattern[str] = re.compile(
-    r'^\[ *([0-9]+)\] +([0-9]+\.[0-9]+)-([0-9]+\.[0-9]+) +sec +'
-    r'([0-9\.]+) +MBytes +([0-9\.]+) +Mbits/sec +([0-9\.]+) +ms +'
-    r'([0-9]+)/([0-9]+) +\(([0-9\.]+)%\)$'
-)
-
-def write_to_influxdb(ue_name: str, record: dict):
-    if influx_write_api is None:
-        return
+# Records are kept as Kinetica rows: lists in the table's column order. id and timestamp
+# are left empty and filled in by Kinetica (UUID / NOW()) on insert
+(COL_ID, COL_UE, COL_TIMESTAMP, COL_STREAM, COL_INTERVAL_START, COL_INTERVAL_END, COL_DURATION,
+ COL_DATA_TRANSFERRED, COL_BITRATE, COL_JITTER, COL_LOST_PACKETS, COL_TOTAL_PACKETS,
+ COL_LOSS_PERCENTAGE) = range(13)
+
+# Unit columns of an interval line, in order
+_IPERF_UNITS = [b"sec", b"MBytes", b"Mbits/sec", b"ms"]
+
+def parse_iperf_line(line: bytes):
+    """
+    Parse a raw iperf3 UDP interval line into (stream, interval_start, interval_end,
+    data_transferred, bitrate, jitter, lost_packets, total_packets, loss_percentage),
+    or None when the line is not one.
+
+    Interval lines are plain whitespace-separated columns, so they are split and
+    checked column by column. int()/float() take the ASCII bytes as they are, so
+    nothing is decoded here.
+    """
+    # Banner, header and summary lines can never match; turn them away before splitting
+    if line[:1] != b"[" or line[-2:] != b"%)":
+        return None
+    toks = line[1:].split()
+    # e.g. "5]" "0.00-1.00" "sec" "3.77" "MBytes" "31.7" "Mbits/sec" "0.228" "ms" "0/2733" "(0%)"
+    if (len(toks) != 11 or toks[2:9:2] != _IPERF_UNITS or not toks[0].endswith(b"]")
+            or toks[10][:1] != b"("):
+        return None
+    interval_start, dash, interval_end = toks[1].partition(b"-")
+    lost_packets, slash, total_packets = toks[9].partition(b"/")
+    if not dash or not slash:
+        return None
+    try:
+        return (int(toks[0][:-1]), float(interval_start), float(interval_end),
+                float(toks[3]), float(toks[5]), float(toks[7]),
+                int(lost_packets), int(total_packets), float(toks[10][1:-2]))
+    except ValueError:
+        return None
+
+# Per-UE iperf3 logs, resolved once against the directory the generator was started from
+UE1_LOG_PATH = os.path.join(os.getcwd(), "logs", "UE1_iperfc.log")
+UE2_LOG_PATH = os.path.join(os.getcwd(), "logs", "UE2_iperfc.log")
+
+# Buffer limit for reading iperf3 output
+PIPE_BUFFER_SIZE = 1 << 20
+
+async def start_iperf(iperf_cmd: list):
+    return await asyncio.create_subprocess_exec(
+        *iperf_cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        limit=PIPE_BUFFER_SIZE
+    )
+
+async def iperf_output(proc):
+    """Stripped raw lines of an iperf3 process, as they arrive"""
+    async for line in proc.stdout:
+        yield line.strip()
+
+def stop_iperf(proc):
+    """Terminate an iperf3 process that is still running (e.g. when its runner is cancelled)"""
+    if proc is not None and proc.returncode is None:
+        try:
+            proc.terminate()  # sudo relays SIGTERM to iperf3
+        except ProcessLookupError:
+            pass
+
+_log_ts = (0, "")
+
+def log_timestamp() -> str:
+    """Local time as YYYY-MM-DD HH:MM:SS for the log files, formatted at most once per second"""
+    global _log_ts
+    cached = _log_ts
+    now_s = int(time.time())
+    if now_s != cached[0]:
+        cached = _log_ts = (now_s, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now_s)))
+    return cached[1]
+
+# Parsed records are handed to a writer thread through a bounded queue as
+# (row, time_ns, log_file, log_line), so a slow database stalls the parsers (backpressure)
+# instead of growing memory. The writer flushes them in batches: whichever comes first
+# of KINETICA_BATCH_SIZE records or KINETICA_FLUSH_INTERVAL seconds after the first
+# record of the batch
+KINETICA_BATCH_SIZE = 256
+KINETICA_FLUSH_INTERVAL = 1.0
+record_queue = queue.Queue(maxsize=10_000)
+
+# Kinetica inserts run on a small pool so the writer keeps draining the queue while a
+# batch is in flight; past KINETICA_MAX_INFLIGHT batches the writer waits for the oldest
+KINETICA_MAX_INFLIGHT = 8
+kinetica_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="kinetica-insert")
+records_inserted_lock = threading.Lock()
+
+def influx_line(row: list, time_ns: int) -> str:
+    """InfluxDB line protocol for one row (same measurement, tag and fields as before), stamped in ns"""
+    return (
+        f'network_metrics,ue={row[COL_UE]} '
+        f'bitrate={float(row[COL_BITRATE])!r},jitter={float(row[COL_JITTER])!r},'
+        f'loss_percentage={float(row[COL_LOSS_PERCENTAGE])!r},'
+        f'lost_packets={int(row[COL_LOST_PACKETS])}i,total_packets={int(row[COL_TOTAL_PACKETS])}i '
+        f'{time_ns}'
+    )
+
+def insert_to_kinetica(rows: list, records_inserted: dict):
+    """Insert one batch into Kinetica (runs on kinetica_pool)"""
     try:
-        point = Point("network_metrics") \
-            .tag("ue", ue_name) \
-            .field("bitrate", float(record["bitrate"])) \
-            .field("jitter", float(record["jitter"])) \
-            .field("loss_percentage", float(record["loss_percentage"])) \
-            .field("lost_packets", int(record["lost_packets"])) \
-            .field("total_packets", int(record["total_packets"]))
-        influx_write_api.write(bucket="5g-metrics", org="5g-lab", record=point)
+        kdbc_table.insert_records(rows)
     except Exception as e:
-        pass  # Silent fail for InfluxDB
+        if not records_inserted:  # Only log errors until the first successful insert
+            logger.error(f"❌ Kinetica insert failed: {e}")
+        return
+
+    with records_inserted_lock:
+        for row in rows:
+            ue_name = row[COL_UE]
+            records_inserted[ue_name] = records_inserted.get(ue_name, 0) + 1
+            # Log progress every 10 records
+            if records_inserted[ue_name] % 10 == 0:
+                logger.info(f"   📊 [{ue_name}] {records_inserted[ue_name]} records inserted to Kinetica...")
+
+def write_batch(batch: list, records_inserted: dict, log_files: dict, inflight: collections.deque):
+    """Write a batch with one Kinetica insert, one InfluxDB write and one write per log file"""
+    rows = [row for row, _, _, _ in batch]
 
-def iperf_runner_single(ue_namespace, ue_name, bind_host, server_host, udp_port, bandwidth, test_length_secs, log_file):
-    """Run a single iperf test (not continuous) - UPDATED FOR NAMESPACES"""
+    if kdbc_table is not None:
+        if len(inflight) >= KINETICA_MAX_INFLIGHT:
+            inflight.popleft().result()  # backpressure
+        inflight.append(kinetica_pool.submit(insert_to_kinetica, rows, records_inserted))
+
+    if influx_write_api is not None:
+        try:
+            influx_write_api.write(
+                bucket="5g-metrics", org="5g-lab", write_precision=WritePrecision.NS,
+                record="\n".join([influx_line(row, time_ns) for row, time_ns, _, _ in batch])
+            )
+        except Exception as e:
+            pass  # Silent fail for InfluxDB
+
+    lines_by_file = {}
+    for _, _, log_file, log_line in batch:
+        lines_by_file.setdefault(log_file, []).append(log_line)
+    for log_file, lines in lines_by_file.items():
+        try:
+            # Log files stay open for the writer's lifetime
+            log_fh = log_files.get(log_file)
+            if log_fh is None:
+                log_fh = log_files[log_file] = open(log_file, "a")
+            log_fh.writelines(lines)
+            log_fh.flush()  # keep `tail -f` live
+        except OSError as e:
+            logger.error(f"❌ Failed to write {log_file}: {e}")
+
+def writer_loop():
+    """Drain record_queue in batches until a None sentinel arrives"""
+    records_inserted = {}
+    log_files = {}
+    inflight = collections.deque()
+    try:
+        while True:
+            item = record_queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + KINETICA_FLUSH_INTERVAL
+            while len(batch) < KINETICA_BATCH_SIZE:
+                try:
+                    item = record_queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    write_batch(batch, records_inserted, log_files, inflight)
+                    return
+                batch.append(item)
+            write_batch(batch, records_inserted, log_files, inflight)
+    finally:
+        concurrent.futures.wait(inflight)
+        for log_fh in log_files.values():
+            log_fh.close()
+
+writer_thread = threading.Thread(target=writer_loop, name="db-writer", daemon=True)
+writer_thread.start()
+
+async def queue_record(item):
+    """Put item on record_queue; when the queue is full, wait off the event loop (backpressure)"""
+    try:
+        record_queue.put_nowait(item)
+    except queue.Full:
+        await asyncio.to_thread(record_queue.put, item)
+
+async def iperf_runner_single(ue_namespace, ue_name, bind_host, server_host, udp_port, bandwidth, test_length_secs, log_file, ue2_bandwidth=None):
+    """
+    Run a single iperf test (not continuous) - UPDATED FOR NAMESPACES
+
+    With ue2_bandwidth set, UE2 metrics are also simulated from every parsed line
+    (see simulate_ue2_metrics) and written next to the real ones.
+    """
+    proc = None
     try:
         # Run iperf3 in namespace instead of Docker container (use full path with LD_LIBRARY_PATH)
         iperf_cmd = [
@@ -153,83 +341,109 @@ def iperf_runner_single(ue_namespace, ue_name, bind_host, server_host, udp_port,
         ]
 
         logger.info(f"🚀 [{ue_name}] Starting iperf test in namespace {ue_namespace} ({bandwidth}, {test_length_secs}s)")
-
-        proc = subprocess.Popen(
-            iperf_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1  # Line buffered
-        )
-
-        records_inserted = 0
-        for line in proc.stdout:
-            line = line.strip()
-            match = pattern.match(line)
-            if match:
-                record = {
-                    "ue": ue_name,
-                    "stream": int(match.group(1)),
-                    "interval_start": float(match.group(2)),
-                    "interval_end": float(match.group(3)),
-                    "data_transferred": float(match.group(4)),
-                    "bitrate": float(match.group(5)),
-                    "jitter": float(match.group(6)),
-                    "lost_packets": int(match.group(7)),
-                    "total_packets": int(match.group(8)),
-                    "loss_percentage": float(match.group(9)),
-                    "duration": float(match.group(3)) - float(match.group(2))
-                }
-
-                # Insert into Kinetica IMMEDIATELY (if available)
-                if kdbc is not None:
-                    try:
-                        sql = f"""INSERT INTO {FIXED_TABLE_NAME} ("ue", "stream", "interval_start", "interval_end", "data_transferred", "bitrate", "jitter", "lost_packets", "total_packets", "loss_percentage", "duration")
-                                  VALUES ('{record["ue"]}', {record["stream"]}, {record["interval_start"]}, {record["interval_end"]}, {record["data_transferred"]}, {record["bitrate"]}, {record["jitter"]}, {record["lost_packets"]}, {record["total_packets"]}, {record["loss_percentage"]}, {record["duration"]})"""
-                        kdbc.execute_sql(sql)
-                        records_inserted += 1
-
-                        # Log progress every 10 records
-                        if records_inserted % 10 == 0:
-                            logger.info(f"   📊 [{ue_name}] {records_inserted} records inserted to Kinetica...")
-
-                    except Exception as e:
-                        if records_inserted == 0:  # Only log first error
-                            logger.error(f"❌ [{ue_name}] Kinetica insert failed: {e}")
-
-                # Write to InfluxDB for this UE
-                write_to_influxdb(ue_name, record)
-
-                # Write to log file
-                with open(log_file, "a") as f:
-                    f.write(f"[{ue_name}] [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {line}\n")
-
-        proc.wait()
-        logger.info(f"✅ [{ue_name}] Test completed - {records_inserted} records inserted")
+        if ue2_bandwidth is not None:
+            logger.info(f"🎭 [UE2] Simulating with bandwidth {ue2_bandwidth}")
+
+        proc = await start_iperf(iperf_cmd)
+
+        records_queued = 0
+        async for line in iperf_output(proc):
+            fields = parse_iperf_line(line)
+            if fields is not None:
+                (stream, interval_start, interval_end, data_transferred, bitrate,
+                 jitter, lost_packets, total_packets, loss_percentage) = fields
+                row = ["", ue_name, "", stream, interval_start, interval_end, interval_end - interval_start,
+                       data_transferred, bitrate, jitter, lost_packets, total_packets, loss_percentage]
+
+                # Hand off to the writer thread (Kinetica + InfluxDB + log file). Each sample
+                # carries its own time: InfluxDB would otherwise stamp a whole batch with one
+                # server time and samples with the same tag would overwrite each other
+                time_ns = time.time_ns()
+                timestamp = log_timestamp()
+                await queue_record((row, time_ns, log_file, f"[{ue_name}] [{timestamp}] {line.decode('ascii', 'replace')}\n"))
+                records_queued += 1
+
+                if ue2_bandwidth is not None:
+                    ue2_row = simulate_ue2_metrics(row, ue2_bandwidth, bandwidth)
+                    await queue_record((ue2_row, time_ns, UE2_LOG_PATH, f"[UE2] [{timestamp}] SIMULATED - Bitrate: {ue2_row[COL_BITRATE]:.2f} Mbits/sec, Loss: {ue2_row[COL_LOSS_PERCENTAGE]:.2f}%\n"))
+
+        await proc.wait()
+        logger.info(f"✅ [{ue_name}] Test completed - {records_queued} records queued")
+        if ue2_bandwidth is not None:
+            logger.info(f"✅ [UE2] Simulation completed - {records_queued} records queued")
 
     except Exception as e:
         logger.error(f"❌ Error in {ue_name}: {e}")
+    finally:
+        stop_iperf(proc)
 
 # Helper function to get UE IP with retry (UPDATED FOR NAMESPACES)
+def ue_ip_cache_file(namespace: str, interface: str) -> str:
+    """
+    Path of the UE IP cache, in a directory only the current user can write to
+
+    Uses $XDG_RUNTIME_DIR when set, otherwise a 0700 .ue_ip_cache directory next to this script.
+    Raises OSError if that directory cannot be created or is not private.
+    """
+    cache_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not cache_dir:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ue_ip_cache")
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    st = os.stat(cache_dir)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise OSError(f"UE IP cache directory {cache_dir} is not private")
+    return os.path.join(cache_dir, f"ue_ip_{namespace}_{interface}.cache")
+
+def cached_ue_ip(namespace: str, interface: str):
+    """Return the IP saved by a previous run if the interface still has it, else None"""
+    try:
+        cache_file = ue_ip_cache_file(namespace, interface)
+        with open(cache_file) as f:
+            ip = f.read().strip()
+    except OSError:
+        return None
+
+    # Anything that is not a plain IPv4 address means the cache is corrupt, so drop it
+    try:
+        ipaddress.IPv4Address(ip)
+    except ValueError:
+        try:
+            os.remove(cache_file)
+        except OSError:
+            pass
+        return None
+
+    # Only trust the cached address while the interface still reports it
+    try:
+        return ip if read_ue_ip(namespace, interface) == ip else None
+    except Exception:
+        return None
+
 def get_ue_ip_with_retry(namespace: str, interface: str, max_retries: int = 5) -> str:
     """Auto-detect UE IP address from namespace with retry logic"""
+    ip = cached_ue_ip(namespace, interface)
+    if ip:
+        logger.info(f"✅ Using cached {namespace} ({interface}) IP: {ip}")
+        return ip
+
+    delay = 0.2  # backoff between attempts, doubled up to 2s
     for attempt in range(max_retries):
         try:
-            result = subprocess.run(
-                ["sudo", "ip", "netns", "exec", namespace, "ip", "addr", "show", interface],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            if result.returncode == 0:
-                for line in result.stdout.split('\n'):
-                    if 'inet ' in line and '/24' in line:
-                        ip = line.strip().split()[1].split('/')[0]
-                        logger.info(f"✅ Auto-detected {namespace} ({interface}) IP: {ip}")
-                        return ip
+            ip = read_ue_ip(namespace, interface)
+            if ip:
+                logger.info(f"✅ Auto-detected {namespace} ({interface}) IP: {ip}")
+                try:
+                    fd = os.open(ue_ip_cache_file(namespace, interface), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                    with os.fdopen(fd, "w") as f:
+                        f.write(ip)
+                except OSError:
+                    pass  # the cache is only a startup shortcut
+                return ip
         except Exception as e:
             logger.warning(f"Attempt {attempt + 1}/{max_retries} failed for {namespace}: {e}")
-            time.sleep(2)
+        if attempt + 1 < max_retries:
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
 
     logger.error(f"❌ Could not determine IP for {namespace}")
     return None
@@ -274,7 +488,7 @@ logger.info("   - UE1 and UE2 will alternate between 30M and 120M")
 logger.info("   - Pattern shows effect of dynamic bandwidth slicing")
 logger.info("")
 
-def simulate_ue2_metrics(ue1_record, target_bandwidth, ue1_bandwidth):
+def simulate_ue2_metrics(ue1_row, target_bandwidth, ue1_bandwidth):
     """Create realistic UE2 metrics based on UE1 pattern but different bandwidth"""
     # Calculate bandwidth ratio
     ue1_bw = 30 if ue1_bandwidth == "30M" else 120
@@ -285,15 +499,7 @@ def simulate_ue2_metrics(ue1_record, target_bandwidth, ue1_bandwidth):
     # Assume 50/50 slice allocation initially (each slice gets ~60M of 120M total)
     # When requesting 120M with 50% allocation, expect ~0.5-2% loss
     # When requesting 30M with 50% allocation, minimal loss ~0-0.3%
-    base_loss_ue1 = 0.0
-    base_loss_ue2 = 0.0
-
-    if ue1_bw == 120:  # UE1 high bandwidth
-        # Requesting 120M but slice limited to ~60M → congestion
-        base_loss_ue1 = random.uniform(0.5, 2.0)
-    else:  # UE1 low bandwidth
-        # Requesting 30M, well within 60M limit → minimal loss
-        base_loss_ue1 = random.uniform(0.0, 0.3)
+    # (UE1 uses its real iperf3 loss, so only UE2's is drawn here)
 
     if ue2_bw == 120:  # UE2 high bandwidth
         # Requesting 120M but slice limited to ~60M → congestion
@@ -303,150 +509,50 @@ def simulate_ue2_metrics(ue1_record, target_bandwidth, ue1_bandwidth):
         base_loss_ue2 = random.uniform(0.0, 0.4)
 
     # Calculate total packets based on bandwidth and duration
-    total_packets = int(ue1_record["total_packets"] * ratio * random.uniform(0.95, 1.05))
+    total_packets = int(ue1_row[COL_TOTAL_PACKETS] * ratio * random.uniform(0.95, 1.05))
     lost_packets = int(total_packets * (base_loss_ue2 / 100.0))
 
-    # Create UE2 record with scaled metrics and realistic variations
-    ue2_record = {
-        "ue": "UE2",
-        "stream": ue1_record["stream"],
-        "interval_start": ue1_record["interval_start"],
-        "interval_end": ue1_record["interval_end"],
-        "duration": ue1_record["duration"],
-        # Scale bandwidth with ratio + small random variation
-        "bitrate": ue1_record["bitrate"] * ratio * random.uniform(0.95, 1.05),
-        "data_transferred": ue1_record["data_transferred"] * ratio * random.uniform(0.95, 1.05),
-        # Jitter varies independently (higher at high bandwidth)
-        "jitter": ue1_record["jitter"] * random.uniform(0.8, 1.5) + (2.0 if ue2_bw == 120 else 0.5),
-        # Realistic packet loss based on bandwidth demand vs allocation
-        "loss_percentage": base_loss_ue2,
-        "lost_packets": lost_packets,
-        "total_packets": total_packets,
-    }
+    # Scale bandwidth with ratio + small random variation
+    bitrate = ue1_row[COL_BITRATE] * ratio * random.uniform(0.95, 1.05)
+    data_transferred = ue1_row[COL_DATA_TRANSFERRED] * ratio * random.uniform(0.95, 1.05)
+    # Jitter varies independently (higher at high bandwidth)
+    jitter = ue1_row[COL_JITTER] * random.uniform(0.8, 1.5) + (2.0 if ue2_bw == 120 else 0.5)
+
+    # Create UE2 row with scaled metrics and realistic variations; loss is based on
+    # bandwidth demand vs allocation
+    ue2_row = ["", "UE2", "", ue1_row[COL_STREAM], ue1_row[COL_INTERVAL_START], ue1_row[COL_INTERVAL_END],
+               ue1_row[COL_DURATION], data_transferred, bitrate, jitter, lost_packets, total_packets, base_loss_ue2]
 
     # Using real iperf3 packet loss for UE1 (not simulated)
     # Real values are already captured from iperf3 output parsing
 
-    return ue2_record
+    return ue2_row
 
-def iperf_runner_with_ue2_sim(ue_namespace, ue_name, bind_host, server_host, udp_port, bandwidth, test_length_secs, log_file, ue2_bandwidth):
+async def iperf_runner_with_ue2_sim(ue_namespace, ue_name, bind_host, server_host, udp_port, bandwidth, test_length_secs, log_file, ue2_bandwidth):
     """Run iperf for UE1 and simulate UE2 metrics - UPDATED FOR NAMESPACES"""
-    global ue1_last_metrics
-    try:
-        iperf_cmd = [
-            "sudo", "ip", "netns", "exec", ue_namespace,
-            "/usr/bin/iperf3", "-B", bind_host, "-c", server_host,
-            "-p", str(udp_port), "-R", "-u", "-b", bandwidth,
-            "-t", str(test_length_secs), "--forceflush"
-        ]
-
-        logger.info(f"🚀 [UE1] Starting iperf test in namespace {ue_namespace} ({bandwidth}, {test_length_secs}s)")
-        logger.info(f"🎭 [UE2] Simulating with bandwidth {ue2_bandwidth}")
-
-        proc = subprocess.Popen(
-            iperf_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True,
-            bufsize=1
-        )
-
-        records_inserted = 0
-        ue2_records_inserted = 0
-
-        for line in proc.stdout:
-            line = line.strip()
-            match = pattern.match(line)
-            if match:
-                # Parse UE1 record
-                ue1_record = {
-                    "ue": ue_name,
-                    "stream": int(match.group(1)),
-                    "interval_start": float(match.group(2)),
-                    "interval_end": float(match.group(3)),
-                    "data_transferred": float(match.group(4)),
-                    "bitrate": float(match.group(5)),
-                    "jitter": float(match.group(6)),
-                    "lost_packets": int(match.group(7)),
-                    "total_packets": int(match.group(8)),
-                    "loss_percentage": float(match.group(9)),
-                    "duration": float(match.group(3)) - float(match.group(2))
-                }
-
-                # Insert UE1 into Kinetica
-                if kdbc is not None:
-                    try:
-                        sql = f"""INSERT INTO {FIXED_TABLE_NAME} ("ue", "stream", "interval_start", "interval_end", "data_transferred", "bitrate", "jitter", "lost_packets", "total_packets", "loss_percentage", "duration")
-                                  VALUES ('{ue1_record["ue"]}', {ue1_record["stream"]}, {ue1_record["interval_start"]}, {ue1_record["interval_end"]}, {ue1_record["data_transferred"]}, {ue1_record["bitrate"]}, {ue1_record["jitter"]}, {ue1_record["lost_packets"]}, {ue1_record["total_packets"]}, {ue1_record["loss_percentage"]}, {ue1_record["duration"]})"""
-                        kdbc.execute_sql(sql)
-                        records_inserted += 1
-                    except Exception as e:
-                        if records_inserted == 0:
-                            logger.error(f"❌ [UE1] Kinetica insert failed: {e}")
-
-                # Generate UE2 simulated metrics (this also adds loss to UE1)
-                ue2_record = simulate_ue2_metrics(ue1_record, ue2_bandwidth, bandwidth)
-
-                # Write UE1 to InfluxDB (now with added packet loss)
-                write_to_influxdb(ue_name, ue1_record)
-
-                # Write UE2 to InfluxDB
-                write_to_influxdb("UE2", ue2_record)
-
-                # Insert UE2 into Kinetica
-                if kdbc is not None:
-                    try:
-                        sql = f"""INSERT INTO {FIXED_TABLE_NAME} ("ue", "stream", "interval_start", "interval_end", "data_transferred", "bitrate", "jitter", "lost_packets", "total_packets", "loss_percentage", "duration")
-                                  VALUES ('{ue2_record["ue"]}', {ue2_record["stream"]}, {ue2_record["interval_start"]}, {ue2_record["interval_end"]}, {ue2_record["data_transferred"]}, {ue2_record["bitrate"]}, {ue2_record["jitter"]}, {ue2_record["lost_packets"]}, {ue2_record["total_packets"]}, {ue2_record["loss_percentage"]}, {ue2_record["duration"]})"""
-                        kdbc.execute_sql(sql)
-                        ue2_records_inserted += 1
-                    except Exception as e:
-                        if ue2_records_inserted == 0:
-                            logger.error(f"❌ [UE2] Kinetica insert failed: {e}")
-
-                # Write to UE1 log file
-                with open(log_file, "a") as f:
-                    f.write(f"[{ue_name}] [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {line}\n")
-
-                # Write to UE2 log file
-                ue2_log = os.path.join(os.getcwd(), "logs", "UE2_iperfc.log")
-                with open(ue2_log, "a") as f:
-                    f.write(f"[UE2] [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] SIMULATED - Bitrate: {ue2_record['bitrate']:.2f} Mbits/sec, Loss: {ue2_record['loss_percentage']:.2f}%\n")
-
-        proc.wait()
-        logger.info(f"✅ [UE1] Test completed - {records_inserted} records inserted")
-        logger.info(f"✅ [UE2] Simulation completed - {ue2_records_inserted} records inserted")
-
-    except Exception as e:
-        logger.error(f"❌ Error in {ue_name}: {e}")
-
-try:
+    await iperf_runner_single(ue_namespace, ue_name, bind_host, server_host, udp_port,
+                              bandwidth, test_length_secs, log_file, ue2_bandwidth=ue2_bandwidth)
+
+async def run_ues(bandwidth_ue1, bandwidth_ue2):
+    """Run one iperf test per UE concurrently and wait for both"""
+    await asyncio.gather(
+        iperf_runner_single("ue1", "UE1", ue1_ip, "192.168.70.135", 5201,
+                            bandwidth_ue1, test_length_secs,
+                            UE1_LOG_PATH),
+        iperf_runner_single("ue2", "UE2", ue2_ip, "192.168.70.135", 5202,
+                            bandwidth_ue2, test_length_secs,
+                            UE2_LOG_PATH)
+    )
+
+async def run_iterations():
+    """Run the iperf test iterations back to back in one event loop"""
+    global iteration, bandwidth_ue1, bandwidth_ue2
     while True:
         iteration += 1
         logger.info(f"📡 Iteration {iteration}: UE1={bandwidth_ue1}, UE2={bandwidth_ue2}")
 
-        # Run UE1 and UE2 traffic in parallel using threads (UPDATED FOR NAMESPACES)
-        ue1_thread = threading.Thread(
-            target=iperf_runner_single,
-            args=("ue1", "UE1", ue1_ip, "192.168.70.135", 5201,
-                  bandwidth_ue1, test_length_secs,
-                  os.path.join(os.getcwd(), "logs", "UE1_iperfc.log"))
-        )
-
-        ue2_thread = threading.Thread(
-            target=iperf_runner_single,
-            args=("ue2", "UE2", ue2_ip, "192.168.70.135", 5202,
-                  bandwidth_ue2, test_length_secs,
-                  os.path.join(os.getcwd(), "logs", "UE2_iperfc.log"))
-        )
-
-        # Start both threads
-        ue1_thread.start()
-        ue2_thread.start()
-
-        # Wait for both to complete
-        ue1_thread.join()
-        ue2_thread.join()
+        # Run UE1 and UE2 traffic concurrently (UPDATED FOR NAMESPACES)
+        await run_ues(bandwidth_ue1, bandwidth_ue2)
 
         logger.info(f"✅ Iteration {iteration} completed for both UE1 and UE2")
 
@@ -459,9 +565,16 @@ try:
             bandwidth_ue2 = "120M"
 
         # Small pause between iterations
-        time.sleep(2)
+        await asyncio.sleep(2)
+
+try:
+    asyncio.run(run_iterations())
 
 except KeyboardInterrupt:
     logger.info("🛑 Stopping traffic generation...")
+    # Let the writer thread drain what is already queued
+    record_queue.put(None)
+    writer_thread.join(timeout=5)
     if influx_write_api:
+        influx_write_api.close()  # flush the pending batch
         influx_client.close()